@@ -10,7 +10,7 @@ User = get_user_model()
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('username', 'email')
+    list_display = ('username', 'email', 'recipes_count', 'followers_count')
     list_filter = ('username', 'email')
     empty_value_display = '-пусто-'
 
@@ -38,11 +38,9 @@ class IngredientInlineAdmin(admin.TabularInline):
 
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientInlineAdmin,)
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count')
     list_filter = ('name', 'author', 'tags')
-
-    def amount_favorites(self, obj):
-        return obj.favorites.count()
+    readonly_fields = ('favorites_count',)
 
 
 class FavoriteAdmin(admin.ModelAdmin):
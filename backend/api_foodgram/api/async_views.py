@@ -0,0 +1,89 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.urls import URLPattern
+
+from .cache import (RECIPES, REFERENCE_DATA, entry_response, response_key,
+                    version_key)
+
+CACHED_READS = {
+    'tagviweset-list': REFERENCE_DATA,
+    'tagviweset-detail': REFERENCE_DATA,
+    'ingredientviewset-list': REFERENCE_DATA,
+    'ingredientviewset-detail': REFERENCE_DATA,
+    'recipeviewset-list': RECIPES,
+    'recipeviewset-detail': RECIPES,
+}
+RENDERED_DOWNLOADS = ('recipeviewset-download-shopping-cart',)
+
+
+def get_cached_entry(request, namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        return None
+    return cache.get(response_key(namespace, version, request))
+
+
+def async_cached_reads(view, namespace):
+    """Асинхронная версия view со справочниками или рецептами.
+
+    Анонимный GET, ответ на который уже лежит в кеше, отдается за один
+    переход в общий пул потоков, минуя DRF. Остальные запросы целиком
+    выполняет обычный view в потоке запроса.
+    """
+    sync_view = sync_to_async(view)
+    get_entry = sync_to_async(get_cached_entry, thread_sensitive=False)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if (request.method == 'GET'
+                and 'HTTP_AUTHORIZATION' not in request.META):
+            entry = await get_entry(request, namespace)
+            if entry is not None:
+                return entry_response(request, entry)
+        return await sync_view(request, *args, **kwargs)
+
+    return async_view
+
+
+def render_streaming(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if not response.streaming:
+        return response
+    rendered = HttpResponse(b''.join(response.streaming_content))
+    for header, value in response.items():
+        rendered[header] = value
+    return rendered
+
+
+def async_rendered_download(view):
+    """Асинхронная версия выгрузки списка покупок.
+
+    ASGI-обработчик Django 4.0 перебирает потоковый ответ в цикле
+    событий, где запросы к базе запрещены, поэтому файл собирается
+    целиком в потоке вместе с запросом.
+    """
+    render = sync_to_async(render_streaming)
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await render(view, request, *args, **kwargs)
+
+    return async_view
+
+
+def with_async_views(patterns):
+    """Подменяет view горячих маршрутов роутера асинхронными версиями."""
+    result = []
+    for pattern in patterns:
+        callback = pattern.callback
+        if pattern.name in CACHED_READS:
+            callback = async_cached_reads(
+                callback, CACHED_READS[pattern.name])
+        elif pattern.name in RENDERED_DOWNLOADS:
+            callback = async_rendered_download(callback)
+        result.append(URLPattern(
+            pattern.pattern, callback, pattern.default_args, pattern.name))
+    return result
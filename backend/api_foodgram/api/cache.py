@@ -0,0 +1,135 @@
+import hashlib
+import json
+import time
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+REFERENCE_DATA = 'reference-data'
+RECIPES = 'recipes'
+
+
+def version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(version_key(namespace), new_version(), timeout=None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def new_version():
+    return {'id': uuid4().hex, 'modified': int(time.time())}
+
+
+def bump_version(namespace):
+    cache.set(version_key(namespace), new_version(), timeout=None)
+
+
+def normalize_query(query_params):
+    return urlencode(sorted(
+        (key, value)
+        for key in query_params
+        for value in sorted(query_params.getlist(key))))
+
+
+def response_key(namespace, version, request):
+    return (f'response:{namespace}:{version["id"]}:{request.get_host()}'
+            f'{request.path}?{normalize_query(request.GET)}')
+
+
+def build_entry(data, modified):
+    body = JSONRenderer().render(data)
+    return {
+        'body': body,
+        'etag': f'"{hashlib.sha256(body).hexdigest()}"',
+        'modified': modified,
+    }
+
+
+def entry_response(request, entry):
+    response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['modified'])
+    patch_cache_control(response, no_cache=True)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['modified'],
+        response=response)
+
+
+def wait_for_entry(key):
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def fill_entry(key, version, get_data):
+    """Собирает запись кеша один раз на все процессы.
+
+    Пока один запрос строит ответ под блокировкой, остальные с тем же
+    ключом ждут готовую запись, а не строят ее параллельно.
+    """
+    lock = f'lock:{key}'
+    locked = cache.add(lock, 1, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+    if not locked:
+        entry = wait_for_entry(key)
+        if entry is not None:
+            return entry
+    try:
+        entry = build_entry(get_data(), version['modified'])
+        cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock)
+    return entry
+
+
+def cached_response(request, namespace, get_data, overlay=None):
+    """Отдает готовое тело ответа из кеша или собирает его через get_data.
+
+    Ключ включает версию пространства имен, поэтому после bump_version
+    старые записи больше не читаются и истекают сами. Для пользователя
+    overlay дописывает в общий ответ его личные поля.
+    """
+    version = get_version(namespace)
+    key = response_key(namespace, version, request)
+    entry = cache.get(key)
+    if entry is None:
+        entry = fill_entry(key, version, get_data)
+    if overlay is not None and request.user.is_authenticated:
+        data = json.loads(entry['body'])
+        overlay(data)
+        entry = build_entry(data, entry['modified'])
+    return entry_response(request, entry)
+
+
+class ReferenceDataCacheMixin:
+    """Кеширует list и retrieve справочников целиком."""
+
+    cache_namespace = REFERENCE_DATA
+
+    def get_list_data(self):
+        return self.get_serializer(
+            self.filter_queryset(self.get_queryset()), many=True).data
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_namespace, self.get_list_data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request, self.cache_namespace,
+            lambda: self.get_serializer(self.get_object()).data)
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from users.models import Follow
+
+from .cache import RECIPES, bump_version
+from .models import Favorite, Recipe
+
+User = get_user_model()
+
+COUNTERS = {
+    Favorite: (Recipe, 'favorites_count', 'recipe_id'),
+    Recipe: (User, 'recipes_count', 'author_id'),
+    Follow: (User, 'followers_count', 'author_id'),
+}
+
+
+def counted_pk(model, instance):
+    """Возвращает id объекта, чей счетчик учитывает строку instance."""
+    return getattr(instance, COUNTERS[model][2])
+
+
+def change_counter(model, pks, delta):
+    """Сдвигает на delta счетчик строк model у объектов pks.
+
+    Уменьшение не опускает счетчик ниже нуля: строки, созданные в обход
+    счетчиков (bulk_create, сырой SQL), не ломают удаление нарушением
+    CHECK, а точное значение восстанавливает reconcile_counters.
+    """
+    if model not in COUNTERS or not pks or not delta:
+        return
+    target, counter, _ = COUNTERS[model]
+    value = F(counter) + delta
+    if delta < 0:
+        value = Greatest(value, 0)
+    target.objects.filter(pk__in=pks).update(**{counter: value})
+    transaction.on_commit(lambda: bump_version(RECIPES))
@@ -0,0 +1,56 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from users.models import Follow
+
+from .models import Recipe
+
+FEED_ORDERING = ('-pub_date', '-id')
+
+
+def after(queryset, position):
+    """Рецепты, идущие в ленте после позиции (pub_date, id)."""
+    queryset = queryset.order_by(*FEED_ORDERING)
+    if position is None:
+        return queryset
+    pub_date, pk = position
+    return queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+
+
+class Feed:
+    """Лента рецептов авторов, на которых подписан пользователь.
+
+    Пока подписок не больше FEED_MERGE_THRESHOLD, страница берется одним
+    запросом по author_id IN (...). Для больших списков авторы делятся
+    на пачки по FEED_AUTHORS_CHUNK, из каждой берется не больше одной
+    страницы ключей, и они сливаются кучей; полные рецепты загружаются
+    только для итоговой страницы.
+    """
+
+    def __init__(self, user, queryset):
+        self.user = user
+        self.queryset = queryset
+
+    def get_authors(self):
+        return list(Follow.objects.filter(
+            user=self.user).values_list('author_id', flat=True))
+
+    def page(self, position, size):
+        authors = self.get_authors()
+        if len(authors) <= settings.FEED_MERGE_THRESHOLD:
+            return list(after(
+                self.queryset.filter(author_id__in=authors), position)[:size])
+        chunk = settings.FEED_AUTHORS_CHUNK
+        streams = [
+            after(Recipe.objects.filter(
+                author_id__in=authors[start:start + chunk]), position
+            ).values_list('pub_date', 'pk')[:size]
+            for start in range(0, len(authors), chunk)]
+        pks = [pk for pub_date, pk in islice(
+            heapq.merge(*streams, reverse=True), size)]
+        recipes = self.queryset.in_bulk(pks)
+        return [recipes[pk] for pk in pks if pk in recipes]
@@ -0,0 +1,14 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки рецепта."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for variant, name in value.items():
+            url = default_storage.url(name)
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
@@ -1,20 +1,56 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank, TrigramSimilarity)
+from django.db import connection
+from django.db.models import (Case, F, FloatField, IntegerField, Q, Value,
+                              When)
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
+                                           ChoiceFilter, FilterSet,
                                            ModelMultipleChoiceFilter)
 
 from .models import Ingredient, Recipe, Tag
+from .search import (HEADLINE_START_MARK, HEADLINE_STOP_MARK,
+                     HEADLINE_WORDS, SEARCH_CONFIG, search_index)
 
 User = get_user_model()
 
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'cooking_time': ('cooking_time', 'id'),
+    '-pub_date': ('-pub_date', '-id'),
+}
+
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(field_name='name', lookup_expr='startswith')
+    name = CharFilter(method='autocomplete')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def autocomplete(self, queryset, name, value):
+        """Сначала совпадения по началу названия, затем похожие.
+
+        На PostgreSQL похожие ищутся по триграммам, на остальных базах -
+        по вхождению подстроки.
+        """
+        is_prefix = Q(name__startswith=value)
+        rank = Case(When(is_prefix, then=Value(0)), default=Value(1),
+                    output_field=IntegerField())
+        if connection.vendor == 'postgresql':
+            queryset = queryset.filter(
+                is_prefix | Q(name__trigram_similar=value)
+            ).annotate(
+                rank=rank, similarity=TrigramSimilarity('name', value)
+            ).order_by('rank', '-similarity', 'name')
+        else:
+            queryset = queryset.filter(
+                name__contains=value
+            ).annotate(rank=rank).order_by('rank', 'name')
+        return queryset[:settings.INGREDIENT_AUTOCOMPLETE_LIMIT]
+
 
 class RecipeFilter(FilterSet):
     tags = ModelMultipleChoiceFilter(
@@ -24,10 +60,15 @@ class RecipeFilter(FilterSet):
     )
     is_favorited = BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = BooleanFilter(method='get_is_in_shopping_cart')
+    search = CharFilter(method='search_recipes')
+    ordering = ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method='order_recipes')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering')
 
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -40,3 +81,35 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(basket__user=user)
         return queryset
+
+    def search_recipes(self, queryset, name, value):
+        """Полнотекстовый поиск по названию и описанию, лучшие - первыми.
+
+        На PostgreSQL ищет по колонке search_vector с GIN-индексом,
+        на остальных базах - по индексу в памяти процесса.
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch')
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F('search_vector'), query),
+                search_headline=SearchHeadline(
+                    'text', query, config=SEARCH_CONFIG,
+                    start_sel=HEADLINE_START_MARK,
+                    stop_sel=HEADLINE_STOP_MARK,
+                    max_words=HEADLINE_WORDS))
+        else:
+            ranks = search_index.search(value)
+            queryset = queryset.filter(pk__in=ranks).annotate(
+                search_rank=Case(
+                    *(When(pk=pk, then=Value(rank))
+                      for pk, rank in ranks.items()),
+                    output_field=FloatField()),
+                search_query=Value(value))
+        return queryset.order_by('-search_rank', '-pub_date', '-id')
+
+    def order_recipes(self, queryset, name, value):
+        """Сортировки по индексам: popular - по числу добавлений
+        в избранное, trending - по рейтингу из update_trending_scores.
+        """
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps
+
+from .cache import RECIPES, bump_version
+from .models import Recipe
+
+FORMAT_EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def encode_variant(image, width):
+    variant = image.copy()
+    if variant.width > width:
+        variant = variant.resize(
+            (width, round(variant.height * width / variant.width)),
+            Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(
+        buffer, settings.RECIPE_IMAGE_FORMAT,
+        quality=settings.RECIPE_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def save_variant(variant, content):
+    extension = FORMAT_EXTENSIONS[settings.RECIPE_IMAGE_FORMAT]
+    return default_storage.save(
+        f'{settings.RECIPE_IMAGE_VARIANTS_DIR}{variant}.{extension}',
+        ContentFile(content))
+
+
+def save_original(content):
+    extension = FORMAT_EXTENSIONS[settings.RECIPE_IMAGE_FORMAT]
+    upload_to = Recipe._meta.get_field('image').upload_to
+    return default_storage.save(
+        f'{upload_to}original.{extension}', ContentFile(content))
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Строит уменьшенные копии картинки рецепта без EXIF.
+
+    Сама картинка тоже заменяется полноразмерной копией без метаданных,
+    а загруженный файл с EXIF остается без ссылок и удаляется
+    collect_media_garbage. Результат записывается, только если картинка
+    рецепта не сменилась за время обработки.
+    """
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info
+                              else 'RGB')
+    if settings.RECIPE_IMAGE_FORMAT == 'JPEG':
+        image = image.convert('RGB')
+    image.info = {}
+    variants = {
+        variant: save_variant(variant, encode_variant(image, width))
+        for variant, width in settings.RECIPE_IMAGE_VARIANTS.items()}
+    original = save_original(encode_variant(image, image.width))
+    if Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image=original, image_variants=variants):
+        bump_version(RECIPES)
+
+
+class ThreadPoolQueue:
+    """Выполняет задачи в пуле потоков процесса."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix='recipe-images')
+
+    def submit(self, task, *args):
+        return self.executor.submit(self.run, task, *args)
+
+    def run(self, task, *args):
+        try:
+            task(*args)
+        finally:
+            connections.close_all()
+
+
+class LocalQueue:
+    """Копит задачи до явного вызова run_pending, например в тестах."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, task, *args):
+        self.pending.append((task, args))
+
+    def run_pending(self):
+        while self.pending:
+            task, args = self.pending.pop(0)
+            task(*args)
+
+
+_queue = None
+
+
+def get_image_queue():
+    global _queue
+    if _queue is None:
+        _queue = import_string(settings.IMAGE_PIPELINE_QUEUE)()
+    return _queue
+
+
+def schedule_recipe_image(recipe):
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    transaction.on_commit(lambda: get_image_queue().submit(
+        process_recipe_image, recipe_id, image_name))
@@ -0,0 +1,71 @@
+from django.db import connection, models
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def unique_columns(opts):
+    constraint = next(
+        constraint for constraint in opts.constraints
+        if isinstance(constraint, models.UniqueConstraint))
+    return ', '.join(
+        quote(opts.get_field(name).column) for name in constraint.fields)
+
+
+def insert_links(model, user, target, pks):
+    """Связывает user с объектами pks поля target одним запросом.
+
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING: строки
+    вставляются только для существующих объектов, уже имеющиеся связи
+    пропускает уникальное ограничение модели. Возвращает id объектов,
+    для которых связь действительно добавлена.
+    """
+    if not pks:
+        return []
+    opts = model._meta
+    field = opts.get_field(target)
+    related = field.related_model._meta
+    obj = model(user=user)
+    columns, values, params = [], [], []
+    for item in opts.concrete_fields:
+        if item.primary_key:
+            continue
+        columns.append(quote(item.column))
+        if item is field:
+            values.append(quote(related.pk.column))
+        else:
+            values.append('%s')
+            params.append(item.get_db_prep_save(
+                item.pre_save(obj, True), connection))
+    sql = (
+        f'INSERT INTO {quote(opts.db_table)} ({", ".join(columns)}) '
+        f'SELECT {", ".join(values)} FROM {quote(related.db_table)} '
+        f'WHERE {quote(related.pk.column)} IN '
+        f'({", ".join(["%s"] * len(pks))}) '
+        f'ON CONFLICT ({unique_columns(opts)}) DO NOTHING '
+        f'RETURNING {quote(field.column)}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [
+            field.get_db_prep_save(pk, connection) for pk in pks])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_links(model, user, target, pks):
+    """Удаляет связи user с объектами pks одним DELETE ... RETURNING.
+
+    Возвращает id объектов, связь с которыми действительно удалена.
+    """
+    if not pks:
+        return []
+    opts = model._meta
+    field = opts.get_field(target)
+    sql = (
+        f'DELETE FROM {quote(opts.db_table)} '
+        f'WHERE {quote(opts.get_field("user").column)} = %s '
+        f'AND {quote(field.column)} IN ({", ".join(["%s"] * len(pks))}) '
+        f'RETURNING {quote(field.column)}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user.pk] + [
+            field.get_db_prep_save(pk, connection) for pk in pks])
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,135 @@
+import json
+from itertools import combinations
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.filters import RecipeFilter
+from api.models import Recipe, Tag
+
+User = get_user_model()
+
+BENCHMARK_USERNAME = 'benchmark'
+
+BENCHMARK_INDEXES = (
+    'recipe_pub_date_id',
+    'recipe_author_pub_date',
+    'recipe_tags_tag_recipe',
+    'ingr_recipe_covering',
+)
+
+FILTER_PARAMS = {
+    'tags': ['breakfast', 'dinner'],
+    'author': None,
+    'is_favorited': 'true',
+    'is_in_shopping_cart': 'true',
+}
+
+
+class Command(BaseCommand):
+    help = ('Seeds recipes and prints EXPLAIN ANALYZE timings of every '
+            'RecipeFilter combination with and without the feed indexes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument(
+            '--skip-seed', action='store_true',
+            help='Reuse recipes seeded by a previous run.')
+
+    def seed(self, recipes, authors):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if not tags:
+            raise CommandError('Load tags first: read_data_from_json')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO users_user (password, is_superuser, username, '
+                'first_name, last_name, email, is_staff, is_active, '
+                'date_joined, recipes_count, followers_count) '
+                "SELECT '!', false, 'benchmark' || i, 'b', 'b', "
+                "'benchmark' || i || '@example.com', false, true, now(), "
+                '0, 0 '
+                'FROM generate_series(0, %s) AS i '
+                'ON CONFLICT DO NOTHING', [authors])
+            cursor.execute(
+                'INSERT INTO api_recipe (author_id, name, image, text, '
+                'cooking_time, pub_date, image_variants, favorites_count, '
+                'trending_score) '
+                "SELECT u.id, 'recipe ' || i, 'recipes/images/benchmark.png', "
+                "'text', 1 + i %% 120, now() - i * interval '1 minute', "
+                "'{}', 0, 0 "
+                'FROM generate_series(1, %s) AS i '
+                'JOIN users_user u '
+                "ON u.username = 'benchmark' || (1 + i %% %s)",
+                [recipes, authors])
+            cursor.execute(
+                'INSERT INTO api_recipe_tags (recipe_id, tag_id) '
+                'SELECT r.id, t.id FROM api_recipe r '
+                'JOIN api_tag t ON (r.id + t.id) %% 3 = 0 '
+                "WHERE r.image = 'recipes/images/benchmark.png'", [])
+            for table in ('api_favorite', 'api_basket'):
+                cursor.execute(
+                    f'INSERT INTO {table} (user_id, recipe_id, created) '
+                    'SELECT u.id, r.id, now() FROM users_user u '
+                    "JOIN api_recipe r ON r.id %% 50 = 0 "
+                    "WHERE u.username = 'benchmark0' "
+                    'ON CONFLICT DO NOTHING', [])
+            cursor.execute(
+                'ANALYZE users_user, api_recipe, api_recipe_tags, '
+                'api_favorite, api_basket')
+
+    def get_querysets(self, user, page_size):
+        request = SimpleNamespace(user=user)
+        params = dict(FILTER_PARAMS, author=str(
+            Recipe.objects.filter(author__username='benchmark1')
+            .values_list('author_id', flat=True).first()))
+        for size in range(len(params) + 1):
+            for names in combinations(params, size):
+                data = {}
+                for name in names:
+                    data[name] = params[name]
+                queryset = RecipeFilter(
+                    data, queryset=Recipe.objects.with_user_flags(user),
+                    request=request).qs[:page_size]
+                yield ', '.join(names) or 'no filters', queryset
+
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Execution Time']
+
+    def measure(self, user, page_size):
+        return {
+            label: self.explain(queryset)
+            for label, queryset in self.get_querysets(user, page_size)}
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmark needs PostgreSQL')
+        if not options['skip_seed']:
+            self.stdout.write(f'Seeding {options["recipes"]} recipes...')
+            self.seed(options['recipes'], options['authors'])
+        user = User.objects.get(username=f'{BENCHMARK_USERNAME}0')
+        after = self.measure(user, options['page_size'])
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in BENCHMARK_INDEXES:
+                    cursor.execute(f'DROP INDEX {index}')
+            before = self.measure(user, options['page_size'])
+            transaction.set_rollback(True)
+        width = max(len(label) for label in after)
+        self.stdout.write(
+            f'{"filters".ljust(width)}  {"before, ms":>12}  '
+            f'{"after, ms":>12}')
+        for label, elapsed in after.items():
+            self.stdout.write(
+                f'{label.ljust(width)}  {before[label]:>12.3f}  '
+                f'{elapsed:>12.3f}')
@@ -0,0 +1,56 @@
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Recipe
+
+RECIPE_MEDIA_DIRS = ('recipes/images/', settings.RECIPE_IMAGE_VARIANTS_DIR)
+
+
+class Command(BaseCommand):
+    help = 'Deletes recipe images that no recipe references anymore.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Keep files younger than this many seconds: they may '
+                 'belong to a request or image task still in progress.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def get_referenced(self):
+        referenced = set()
+        recipes = Recipe.objects.values_list('image', 'image_variants')
+        for image, variants in recipes.iterator():
+            referenced.add(image)
+            referenced.update(variants.values())
+        return referenced
+
+    def walk(self, directory):
+        if not default_storage.exists(directory):
+            return
+        directories, files = default_storage.listdir(directory)
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.walk(posixpath.join(directory, name))
+
+    def handle(self, *args, **options):
+        referenced = self.get_referenced()
+        threshold = timezone.now() - timedelta(seconds=options['min_age'])
+        deleted = 0
+        for directory in RECIPE_MEDIA_DIRS:
+            for name in self.walk(directory):
+                if name in referenced:
+                    continue
+                if default_storage.get_modified_time(name) > threshold:
+                    continue
+                if not options['dry_run']:
+                    default_storage.delete(name)
+                deleted += 1
+                self.stdout.write(name)
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{action} {deleted} files'))
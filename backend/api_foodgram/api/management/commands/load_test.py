@@ -0,0 +1,122 @@
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Recipe
+
+HOST = '127.0.0.1'
+READY_PATH = '/api/tags/'
+READY_TIMEOUT = 30
+MODES = ('wsgi', 'asgi')
+
+
+def percentile(timings, share):
+    return timings[round(share * (len(timings) - 1))]
+
+
+class Command(BaseCommand):
+    help = ('Starts gunicorn with gunicorn.conf.py in each server mode and '
+            'compares throughput and latency of the hot GET endpoints '
+            'under concurrent anonymous load.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--port', type=int, default=8100)
+        parser.add_argument(
+            '--workers', type=int,
+            help='Override the worker count chosen by gunicorn.conf.py.')
+        parser.add_argument(
+            '--paths', nargs='+',
+            help='Paths to request; by default recipes, a recipe, tags '
+                 'and an ingredient search.')
+
+    def get_paths(self):
+        paths = ['/api/recipes/', '/api/tags/',
+                 f'/api/ingredients/?name={quote("мол")}']
+        recipe = Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True).first()
+        if recipe is not None:
+            paths.append(f'/api/recipes/{recipe}/')
+        return paths
+
+    def start_server(self, mode, port, workers):
+        env = dict(os.environ, SERVER_MODE=mode,
+                   GUNICORN_BIND=f'{HOST}:{port}')
+        if workers:
+            env['GUNICORN_WORKERS'] = str(workers)
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+             '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env)
+        deadline = time.monotonic() + READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'{mode} server exited on start')
+            try:
+                connection = http.client.HTTPConnection(HOST, port)
+                connection.request('GET', READY_PATH)
+                if connection.getresponse().status == 200:
+                    return server
+            except OSError:
+                pass
+            time.sleep(0.2)
+        server.terminate()
+        raise CommandError(f'{mode} server did not start in time')
+
+    def run_load(self, port, paths, requests, concurrency):
+        local = threading.local()
+
+        def fetch(path):
+            if not hasattr(local, 'connection'):
+                local.connection = http.client.HTTPConnection(HOST, port)
+            start = time.perf_counter()
+            try:
+                local.connection.request('GET', path)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                del local.connection
+                status = None
+            return time.perf_counter() - start, status
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(
+                fetch, islice(cycle(paths), requests)))
+            elapsed = time.perf_counter() - start
+        return results, elapsed
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.get_paths()
+        for mode in options['modes']:
+            server = self.start_server(
+                mode, options['port'], options['workers'])
+            try:
+                self.run_load(options['port'], paths, len(paths), 1)
+                results, elapsed = self.run_load(
+                    options['port'], paths, options['requests'],
+                    options['concurrency'])
+            finally:
+                server.terminate()
+                server.wait()
+            timings = sorted(timing for timing, status in results)
+            failed = sum(status != 200 for timing, status in results)
+            self.stdout.write(
+                f'{mode}: {len(results) / elapsed:.0f} requests/s, '
+                f'p50 {percentile(timings, 0.5) * 1000:.1f} ms, '
+                f'p99 {percentile(timings, 0.99) * 1000:.1f} ms, '
+                f'{failed} failed')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.images import process_recipe_image
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Builds image variants for recipes that still have none, for '
+            'example because a restart dropped their queued image task. '
+            'Also replaces the uploaded image with a copy without EXIF.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only list the recipes without variants.')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.filter(image_variants={}).order_by(
+            'pk').values_list('pk', 'image')
+        if options['dry_run']:
+            for pk, image in recipes.iterator():
+                self.stdout.write(f'recipe {pk}: {image}')
+            return
+        processed = failed = 0
+        for pk, image in recipes.iterator():
+            try:
+                process_recipe_image(pk, image)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'recipe {pk}: {image}: {error}')
+                failed += 1
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} recipes processed, {failed} failed'))
@@ -1,26 +1,122 @@
+import csv
 import json
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.cache import REFERENCE_DATA, bump_version
 from api.models import Ingredient, Tag
 
+CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+
+
+def read_json_array(file):
+    """Yields objects of a JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Expected a JSON array')
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                row, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            if end == len(buffer) and not eof:
+                break
+            yield row
+            position = end
+        if eof:
+            raise CommandError('Truncated JSON array')
+        chunk = file.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+
+
+def read_ndjson(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(file):
+    yield from csv.DictReader(file)
+
+
+READERS = {
+    'json': read_json_array,
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
 
 class Command(BaseCommand):
+    help = 'Loads ingredients and tags from JSON, NDJSON or CSV files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients', default='data/ingredients.json')
+        parser.add_argument('--tags', default='data/tags.json')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='Input format, detected by file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Parse the files without writing to the database.')
+
+    def read_rows(self, path, file_format):
+        file_format = file_format or FORMATS.get(Path(path).suffix.lower())
+        if file_format is None:
+            raise CommandError(f'Unknown format of {path}')
+        with open(path, encoding='utf-8', newline='') as file:
+            yield from READERS[file_format](file)
 
-    def add_objects(self, model, reader):
-        model_object = model
-        for row in reader:
-            model_object.objects.create(**row)
-        return f'Database Update {model}'
+    def add_objects(self, model, rows, batch_size, dry_run):
+        rows = iter(rows)
+        count_before = model.objects.count()
+        total = 0
+        while True:
+            try:
+                batch = [model(**row) for row in islice(rows, batch_size)]
+            except TypeError as error:
+                raise CommandError(f'{model.__name__}: {error}')
+            if not batch:
+                break
+            if not dry_run:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            self.stdout.write(f'{model.__name__}: {total} rows processed')
+        created = model.objects.count() - count_before
+        return (f'Database Update {model}: {total} rows read, '
+                f'{created} added')
 
     def handle(self, *args, **options):
-        with open('data/ingredients.json', 'rb') as ingredients:
-            reader_ingredients = json.load(ingredients)
-        with open('data/tags.json', 'rb') as tags:
-            reader_tags = json.load(tags)
-        self.stdout.write(
-            self.style.SUCCESS(
-                self.add_objects(Ingredient, reader_ingredients)))
-        self.stdout.write(
-            self.style.SUCCESS(
-                self.add_objects(Tag, reader_tags)))
+        sources = (
+            (Ingredient, options['ingredients']),
+            (Tag, options['tags']),
+        )
+        with transaction.atomic():
+            for model, path in sources:
+                self.stdout.write(
+                    self.style.SUCCESS(self.add_objects(
+                        model, self.read_rows(path, options['format']),
+                        options['batch_size'], options['dry_run'])))
+        if not options['dry_run']:
+            bump_version(REFERENCE_DATA)
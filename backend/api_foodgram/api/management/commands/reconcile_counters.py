@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.cache import RECIPES, bump_version
+from api.models import Favorite, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recounts denormalized counters and fixes the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report the rows with wrong counters.')
+
+    def handle(self, *args, **options):
+        for model, counter, related, field in COUNTERS:
+            drifted = model.objects.annotate(
+                actual=count_of(related, field)
+            ).exclude(**{counter: F('actual')})
+            if options['dry_run']:
+                fixed = drifted.count()
+            else:
+                fixed = model.objects.filter(
+                    pk__in=drifted.values('pk')
+                ).update(**{counter: count_of(related, field)})
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}.{counter}: {fixed} rows drifted'))
+        if not options['dry_run']:
+            bump_version(RECIPES)
@@ -0,0 +1,146 @@
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.models import Basket, Favorite, Recipe
+from api.views import RecipesViewSet
+from users.models import Follow
+from users.views import UserViewSet
+
+User = get_user_model()
+
+PREFIX = 'stress-toggles'
+TOGGLES = {
+    'favorite': (RecipesViewSet, 'favorite', Favorite, 'recipe', 'recipes'),
+    'shopping_cart': (
+        RecipesViewSet, 'shopping_cart', Basket, 'recipe', 'recipes'),
+    'subscribe': (UserViewSet, 'subscribe', Follow, 'author', 'users'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Fires parallel favorite, shopping cart and subscribe toggles '
+            'at a few targets and checks that rows, counters and responses '
+            'agree. Creates temporary users and recipes and deletes them '
+            'afterwards. Run it against PostgreSQL: SQLite serializes '
+            'writers and rejects most of the parallel requests.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--toggles', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=32)
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--targets', type=int, default=3)
+
+    def setup(self, users, targets):
+        self.users = [
+            User.objects.create(username=f'{PREFIX}-{number}',
+                                email=f'{PREFIX}-{number}@example.com')
+            for number in range(users)]
+        self.authors = [
+            User.objects.create(username=f'{PREFIX}-author-{number}',
+                                email=f'{PREFIX}-author-{number}@example.com')
+            for number in range(targets)]
+        self.recipes = [
+            Recipe.objects.create(
+                author=self.authors[0], name=f'{PREFIX}-{number}',
+                text=PREFIX, cooking_time=1, image=f'{PREFIX}.png')
+            for number in range(targets)]
+        self.targets = {'recipe': self.recipes, 'author': self.authors}
+
+    def cleanup(self):
+        User.objects.filter(username__startswith=PREFIX).delete()
+
+    def toggle(self, job):
+        name, method, user, target = job
+        viewset, action, _, _, prefix = TOGGLES[name]
+        request = getattr(self.factory, method)(
+            f'/api/{prefix}/{target.pk}/{action}/')
+        force_authenticate(request, user)
+        view = viewset.as_view(
+            {method: action}, detail=True,
+            **getattr(viewset, action).kwargs)
+        try:
+            return job, view(request, pk=str(target.pk)).status_code
+        finally:
+            connection.close()
+
+    def jobs(self, toggles):
+        for _ in range(toggles):
+            name = random.choice(list(TOGGLES))
+            yield (name, random.choice(['post', 'delete']),
+                   random.choice(self.users),
+                   random.choice(self.targets[TOGGLES[name][3]]))
+
+    def check_responses(self, statuses):
+        """Число успешных добавлений минус удалений по каждой паре
+        должно совпадать с наличием строки.
+        """
+        errors = []
+        balance = Counter()
+        for (name, method, user, target), status in statuses:
+            if status not in (201, 204, 400):
+                errors.append(f'{name} {method}: unexpected status {status}')
+            elif status != 400:
+                balance[name, user.pk, target.pk] += (
+                    1 if status == 201 else -1)
+        for name, (_, _, model, field, _) in TOGGLES.items():
+            for user in self.users:
+                for target in self.targets[field]:
+                    exists = model.objects.filter(
+                        user=user, **{field: target}).exists()
+                    if balance[name, user.pk, target.pk] != exists:
+                        errors.append(
+                            f'{name} user={user.pk} target={target.pk}: '
+                            f'{balance[name, user.pk, target.pk]} net '
+                            f'successes, row exists={exists}')
+        return errors
+
+    def check_counters(self):
+        errors = []
+        for recipe in Recipe.objects.filter(pk__in=[
+                recipe.pk for recipe in self.recipes]):
+            actual = Favorite.objects.filter(recipe=recipe).count()
+            if recipe.favorites_count != actual:
+                errors.append(f'recipe {recipe.pk}: favorites_count '
+                              f'{recipe.favorites_count}, rows {actual}')
+        for author in User.objects.filter(pk__in=[
+                author.pk for author in self.authors]):
+            actual = Follow.objects.filter(author=author).count()
+            if author.followers_count != actual:
+                errors.append(f'author {author.pk}: followers_count '
+                              f'{author.followers_count}, rows {actual}')
+        return errors
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=PREFIX).exists():
+            raise CommandError(
+                f'Users named {PREFIX}-* already exist, remove them first.')
+        self.factory = APIRequestFactory()
+        self.setup(options['users'], options['targets'])
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(options['workers']) as executor:
+                statuses = list(executor.map(
+                    self.toggle, self.jobs(options['toggles'])))
+            elapsed = time.perf_counter() - start
+            errors = (self.check_responses(statuses)
+                      + self.check_counters())
+        finally:
+            self.cleanup()
+        codes = Counter(status for job, status in statuses)
+        self.stdout.write(
+            f'{len(statuses)} toggles in {elapsed:.1f} s '
+            f'({len(statuses) / elapsed:.0f}/s), statuses: '
+            + ', '.join(f'{code}: {count}'
+                        for code, count in sorted(codes.items())))
+        if errors:
+            for error in errors:
+                self.stderr.write(error)
+            raise CommandError(f'{len(errors)} invariant violations')
+        self.stdout.write(self.style.SUCCESS('All invariants hold'))
@@ -0,0 +1,48 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import RECIPES, bump_version
+from api.models import Basket, Favorite, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Recomputes time-decayed trending scores of recipes from '
+            'recent favorites and shopping cart additions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def get_scores(self, now):
+        since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+        half_life = timedelta(
+            hours=settings.TRENDING_HALF_LIFE_HOURS).total_seconds()
+        scores = defaultdict(float)
+        sources = (
+            (Favorite, settings.TRENDING_FAVORITE_WEIGHT),
+            (Basket, settings.TRENDING_BASKET_WEIGHT),
+        )
+        for model, weight in sources:
+            events = model.objects.filter(
+                created__gte=since).values_list('recipe_id', 'created')
+            for recipe_id, created in events.iterator():
+                age = (now - created).total_seconds()
+                scores[recipe_id] += weight * 0.5 ** (age / half_life)
+        return scores
+
+    def handle(self, *args, **options):
+        scores = self.get_scores(timezone.now())
+        with transaction.atomic():
+            Recipe.objects.filter(trending_score__gt=0).update(
+                trending_score=0)
+            Recipe.objects.bulk_update(
+                [Recipe(pk=pk, trending_score=score)
+                 for pk, score in scores.items()],
+                ['trending_score'], batch_size=options['batch_size'])
+        bump_version(RECIPES)
+        self.stdout.write(self.style.SUCCESS(
+            f'Trending scores updated for {len(scores)} recipes'))
@@ -0,0 +1,262 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+CHANGES_KEY = 'recipe-ingredients:changes'
+
+
+def change_key(seq):
+    return f'{CHANGES_KEY}:{seq}'
+
+
+def log_recipe_change(pk):
+    """Записывает изменение состава рецепта в общий для процессов журнал."""
+    cache.add(CHANGES_KEY, 0, timeout=None)
+    seq = cache.incr(CHANGES_KEY)
+    cache.set(change_key(seq), pk, settings.INGREDIENT_INDEX_LOG_TIMEOUT)
+
+
+def slots_bitmap(slots, size):
+    """Собирает битовую карту из номеров битов за один проход."""
+    bits = bytearray((size + 7) // 8)
+    for slot in slots:
+        bits[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bit_slots(bitmap):
+    """Номера установленных битов от старшего к младшему."""
+    bits = bin(bitmap)
+    top = len(bits) - 1
+    position = bits.find('1', 2)
+    while position != -1:
+        yield top - position
+        position = bits.find('1', position + 1)
+
+
+def count_overlaps(bitmaps):
+    """Раскладывает рецепты по числу совпавших карт.
+
+    Карты складываются поразрядно, как в сумматоре: planes[i] - i-й бит
+    счетчика совпадений для всех рецептов сразу.
+    """
+    candidates = 0
+    planes = []
+    for bitmap in bitmaps:
+        candidates |= bitmap
+        carry = bitmap
+        for number, plane in enumerate(planes):
+            planes[number], carry = plane ^ carry, plane & carry
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+    overlaps = {}
+    for overlap in range(1, min(len(bitmaps), 2 ** len(planes) - 1) + 1):
+        bitmap = candidates
+        for number, plane in enumerate(planes):
+            bitmap &= plane if overlap >> number & 1 else ~plane
+        if bitmap:
+            overlaps[overlap] = bitmap
+    return overlaps
+
+
+class Matches:
+    """Ленивый список id рецептов, упорядоченный по числу недостающих
+    ингредиентов, а при равенстве - от новых к старым.
+
+    Поддерживает len() и срезы, поэтому его можно отдать пагинатору:
+    id достаются только для запрошенной страницы.
+    """
+
+    def __init__(self, groups, pks):
+        self.groups = groups
+        self.pks = pks
+
+    def __len__(self):
+        return sum(bitmap.bit_count() for missing, bitmap in self.groups)
+
+    def __getitem__(self, item):
+        skip = item.start or 0
+        size = None if item.stop is None else item.stop - skip
+        result = []
+        for missing, bitmap in self.groups:
+            count = bitmap.bit_count()
+            if skip >= count:
+                skip -= count
+                continue
+            for slot in bit_slots(bitmap):
+                if skip:
+                    skip -= 1
+                    continue
+                if len(result) == size:
+                    return result
+                result.append((self.pks[slot], missing))
+        return result
+
+
+class IngredientBitmaps:
+    """Битовые карты рецептов по ингредиентам.
+
+    Каждому рецепту выделен бит, для каждого ингредиента и для каждого
+    размера рецепта хранится число-битовая карта. seq - номер последнего
+    изменения из журнала, учтенного в картах.
+    """
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.slots = {}
+        self.pks = []
+        self.recipes = {}
+        self.ingredients = defaultdict(int)
+        self.sizes = defaultdict(int)
+
+    @classmethod
+    def build(cls):
+        from .models import IngredientsForRecipe, Recipe
+        bitmaps = cls(cache.get(CHANGES_KEY, 0))
+        recipes = defaultdict(list)
+        lines = IngredientsForRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in lines.iterator():
+            recipes[recipe_id].append(ingredient_id)
+        ingredients = defaultdict(list)
+        sizes = defaultdict(list)
+        for pk in Recipe.objects.order_by('pk').values_list('pk', flat=True):
+            slot = bitmaps.slots[pk] = len(bitmaps.pks)
+            bitmaps.pks.append(pk)
+            bitmaps.recipes[pk] = frozenset(recipes.get(pk, ()))
+            for ingredient_id in bitmaps.recipes[pk]:
+                ingredients[ingredient_id].append(slot)
+            sizes[len(bitmaps.recipes[pk])].append(slot)
+        for ingredient_id, slots in ingredients.items():
+            bitmaps.ingredients[ingredient_id] = slots_bitmap(
+                slots, len(bitmaps.pks))
+        for size, slots in sizes.items():
+            bitmaps.sizes[size] = slots_bitmap(slots, len(bitmaps.pks))
+        return bitmaps
+
+    def add(self, pk, ingredients):
+        self.remove(pk)
+        if pk not in self.slots:
+            self.slots[pk] = len(self.pks)
+            self.pks.append(pk)
+        bit = 1 << self.slots[pk]
+        self.recipes[pk] = frozenset(ingredients)
+        for ingredient_id in self.recipes[pk]:
+            self.ingredients[ingredient_id] |= bit
+        self.sizes[len(self.recipes[pk])] |= bit
+
+    def remove(self, pk):
+        if pk not in self.recipes:
+            return
+        mask = ~(1 << self.slots[pk])
+        ingredients = self.recipes.pop(pk)
+        for ingredient_id in ingredients:
+            self.ingredients[ingredient_id] &= mask
+        self.sizes[len(ingredients)] &= mask
+
+    def apply_changes(self, pks):
+        from .models import IngredientsForRecipe, Recipe
+        recipes = {pk: [] for pk in Recipe.objects.filter(
+            pk__in=pks).values_list('pk', flat=True)}
+        lines = IngredientsForRecipe.objects.filter(
+            recipe_id__in=recipes).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in lines:
+            recipes[recipe_id].append(ingredient_id)
+        for pk in pks:
+            if pk in recipes:
+                self.add(pk, recipes[pk])
+            else:
+                self.remove(pk)
+                if pk in self.slots:
+                    self.pks[self.slots.pop(pk)] = None
+
+
+class IngredientIndex:
+    """Битовые карты рецептов по ингредиентам в памяти процесса.
+
+    Пересечение набора продуктов с рецептами считается побитовым
+    сложением карт, без обхода рецептов. Изменения рецептов процессы
+    узнают из журнала в общем кеше. Если журнал потерян, карты строятся
+    заново в фоновом потоке, а запросы тем временем получают ответ по
+    старым картам. Ждать сборки приходится только запросам, пришедшим
+    в процесс раньше первой сборки; warm_up начинает ее при старте.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.bitmaps = None
+
+    def ensure_built(self):
+        if self.bitmaps is not None:
+            return
+        with self.build_lock:
+            if self.bitmaps is None:
+                self.bitmaps = IngredientBitmaps.build()
+
+    def warm_up(self):
+        """Строит карты в фоновом потоке, не задерживая старт процесса."""
+        threading.Thread(target=self.build_in_thread, daemon=True).start()
+
+    def build_in_thread(self):
+        try:
+            self.ensure_built()
+        finally:
+            connections.close_all()
+
+    def start_rebuild(self):
+        """Запускает пересборку в фоне, если она еще не идет."""
+        if self.build_lock.acquire(blocking=False):
+            threading.Thread(target=self.rebuild, daemon=True).start()
+
+    def rebuild(self):
+        """Подменяет карты собранными заново; build_lock уже захвачен."""
+        try:
+            bitmaps = IngredientBitmaps.build()
+            with self.lock:
+                self.bitmaps = bitmaps
+        finally:
+            connections.close_all()
+            self.build_lock.release()
+
+    def sync(self):
+        bitmaps = self.bitmaps
+        seq = cache.get(CHANGES_KEY, 0)
+        if seq == bitmaps.seq:
+            return
+        if (seq < bitmaps.seq
+                or seq - bitmaps.seq > settings.INGREDIENT_INDEX_MAX_CHANGES):
+            return self.start_rebuild()
+        changes = cache.get_many(
+            [change_key(number) for number in range(bitmaps.seq + 1, seq + 1)])
+        if len(changes) < seq - bitmaps.seq:
+            return self.start_rebuild()
+        bitmaps.apply_changes(set(changes.values()))
+        bitmaps.seq = seq
+
+    def match(self, have):
+        """Рецепты, в которых есть хотя бы один из продуктов have."""
+        self.ensure_built()
+        with self.lock:
+            self.sync()
+            bitmaps = [
+                self.bitmaps.ingredients.get(pk, 0) for pk in set(have)]
+            sizes = dict(self.bitmaps.sizes)
+            pks = self.bitmaps.pks
+        overlaps = count_overlaps(bitmaps)
+        groups = []
+        for missing in range(max(sizes, default=0) + 1):
+            bitmap = 0
+            for overlap, matched in overlaps.items():
+                bitmap |= matched & sizes.get(overlap + missing, 0)
+            if bitmap:
+                groups.append((missing, bitmap))
+        return Matches(groups, pks)
+
+
+ingredient_index = IngredientIndex()
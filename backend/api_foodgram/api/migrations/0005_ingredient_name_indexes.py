@@ -0,0 +1,34 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:15
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX ingredient_name_trgm ON api_ingredient '
+        'USING gin (name gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_ingredientsforrecipe_recipe'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
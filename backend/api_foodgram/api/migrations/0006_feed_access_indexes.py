@@ -0,0 +1,30 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ingredient_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientsforrecipe',
+            index=models.Index(fields=['recipe', 'ingredient'], include=('amount',), name='ingr_recipe_covering'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe '
+            'ON api_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe',
+        ),
+    ]
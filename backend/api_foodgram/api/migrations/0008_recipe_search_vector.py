@@ -0,0 +1,40 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:28
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('api', 'Recipe')
+    Recipe.objects.using(schema_editor.connection.alias).update(
+        search_vector=(
+            SearchVector('name', weight='A', config='russian')
+            + SearchVector('text', weight='B', config='russian')))
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector ON api_recipe '
+        'USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), 0)
+
+
+def fill_counters(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model('api', 'Recipe')
+    Favorite = apps.get_model('api', 'Favorite')
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.using(alias).update(
+        favorites_count=count_of(Favorite, 'recipe'))
+    User.objects.using(alias).update(
+        recipes_count=count_of(Recipe, 'author'),
+        followers_count=count_of(Follow, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_recipe_search_vector'),
+        ('users', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
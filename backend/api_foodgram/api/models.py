@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
+
+from users.models import Follow
 
 User = get_user_model()
 
@@ -30,6 +34,13 @@ class Ingredient(models.Model):
                 name='uniq_ingr'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=['name'],
+                name='ingredient_name_prefix',
+                opclasses=['varchar_pattern_ops']
+            ),
+        )
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['pk']
@@ -61,6 +72,44 @@ class IngredientsForRecipe(models.Model):
                 fields=['ingredient', 'recipe'],
                 name='uniq_ingr_recipe')
         ]
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                include=['amount'],
+                name='ingr_recipe_covering')
+        ]
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов
+        фиксированным числом запросов.
+        """
+        return self.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredients_for_recipe',
+                queryset=IngredientsForRecipe.objects.select_related(
+                    'ingredient')))
+
+    def with_user_flags(self, user):
+        """Помечает рецепты флагами избранного, корзины и подписки
+        на автора для пользователя, чтобы не делать запрос на каждый рецепт.
+        """
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                is_subscribed=false)
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Basket.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))))
 
 
 class Recipe(models.Model):
@@ -70,6 +119,8 @@ class Recipe(models.Model):
         verbose_name='Автор')
     name = models.CharField('Название', max_length=200)
     image = models.ImageField('Картинка', upload_to='recipes/images/')
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки', default=dict, blank=True)
     ingredients = models.ManyToManyField(
         Ingredient,
         through=IngredientsForRecipe,
@@ -83,11 +134,31 @@ class Recipe(models.Model):
         'Время приготовления',
         validators=[MinValueValidator(1)])
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное', default=0, editable=False)
+    trending_score = models.FloatField(
+        'Рейтинг популярности', default=0, editable=False)
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_popular'),
+            models.Index(fields=['-trending_score', '-id'],
+                         name='recipe_trending'),
+            models.Index(fields=['cooking_time', 'id'],
+                         name='recipe_cooking_time'),
+        ]
 
 
 class Favorite(models.Model):
@@ -100,6 +171,7 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name='favorites',
         verbose_name='Рецепт')
+    created = models.DateTimeField('Дата добавления', auto_now_add=True)
 
     class Meta:
         verbose_name = 'Избранное'
@@ -109,6 +181,9 @@ class Favorite(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='uniq_favorite')
         ]
+        indexes = [
+            models.Index(fields=['created'], name='favorite_created'),
+        ]
 
 
 class Basket(models.Model):
@@ -122,6 +197,7 @@ class Basket(models.Model):
         on_delete=models.CASCADE,
         related_name='basket',
         verbose_name='Рецепт')
+    created = models.DateTimeField('Дата добавления', auto_now_add=True)
 
     class Meta:
         verbose_name = 'Корзина'
@@ -131,3 +207,6 @@ class Basket(models.Model):
             models.UniqueConstraint(fields=['user', 'recipe'],
                                     name='uniq_recipe_basket')
         ]
+        indexes = [
+            models.Index(fields=['created'], name='basket_created'),
+        ]
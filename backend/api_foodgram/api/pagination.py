@@ -0,0 +1,246 @@
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import BooleanField, Expression, F, Value
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       LimitOffsetPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .filters import RECIPE_ORDERINGS
+
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса PostgreSQL без его выполнения."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class RowComparison(Expression):
+    """Сравнение строк (a, b) < (x, y), которое база проверяет по индексу."""
+
+    output_field = BooleanField()
+
+    def __init__(self, fields, operator, values):
+        super().__init__()
+        self.fields = list(fields)
+        self.operator = operator
+        self.values = list(values)
+
+    def get_source_expressions(self):
+        return self.fields + self.values
+
+    def set_source_expressions(self, exprs):
+        self.fields = exprs[:len(self.fields)]
+        self.values = exprs[len(self.fields):]
+
+    def as_sql(self, compiler, connection):
+        sql, params = [], []
+        for expressions in (self.fields, self.values):
+            parts = []
+            for expression in expressions:
+                part, part_params = compiler.compile(expression)
+                parts.append(part)
+                params.extend(part_params)
+            sql.append(f'({", ".join(parts)})')
+        return f' {self.operator} '.join(sql), params
+
+
+class KeysetPagination(CursorPagination):
+    """Курсор по составному ключу из всех полей ordering.
+
+    Последнее поле порядка уникально (id), поэтому позиция однозначна:
+    следующая страница берется сравнением строки ключей без OFFSET, даже
+    когда у большинства рецептов одинаковое значение первого поля. Все
+    поля порядка должны сортироваться в одну сторону.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def decode_position(self, model):
+        try:
+            values = self.cursor.position.split('|')
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                model._meta.get_field(order.lstrip('-')).to_python(value)
+                for order, value in zip(self.ordering, values)]
+        except (AttributeError, ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, instance):
+        return '|'.join(
+            instance._meta.get_field(order.lstrip('-')).value_to_string(
+                instance)
+            for order in self.ordering)
+
+    def after(self, queryset, ordering):
+        """Строки, идущие в порядке ordering после позиции курсора."""
+        values = self.decode_position(queryset.model)
+        fields = [queryset.model._meta.get_field(order.lstrip('-'))
+                  for order in ordering]
+        return queryset.filter(RowComparison(
+            [F(field.name) for field in fields],
+            '<' if ordering[0].startswith('-') else '>',
+            [Value(value, output_field=field)
+             for field, value in zip(fields, values)]))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count_mode = request.query_params.get(self.count_query_param)
+        self.count = None
+        if count_mode == COUNT_EXACT:
+            self.count = queryset.count()
+        elif count_mode == COUNT_ESTIMATE:
+            self.count = estimate_count(queryset)
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        positioned = (self.cursor is not None
+                      and self.cursor.position is not None)
+        reverse = positioned and self.cursor.reverse
+        ordering = self.ordering
+        if reverse:
+            ordering = [order[1:] if order.startswith('-') else f'-{order}'
+                        for order in ordering]
+        queryset = queryset.order_by(*ordering)
+        if positioned:
+            queryset = self.after(queryset, ordering)
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, positioned
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self.encode_position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class LimitOffsetOrCursorPagination(LimitOffsetPagination):
+    """limit/offset по умолчанию, курсорная пагинация по ?cursor=.
+
+    В курсорном режиме COUNT(*) не выполняется, пока клиент не попросит
+    его параметром ?count=exact или ?count=estimate.
+    """
+
+    cursor_ordering = ('-id',)
+
+    def get_cursor_ordering(self, request):
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(self.get_cursor_ordering(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(LimitOffsetOrCursorPagination):
+    cursor_ordering = ('-pub_date', '-id')
+
+    def get_cursor_ordering(self, request):
+        return RECIPE_ORDERINGS.get(
+            request.query_params.get('ordering'), self.cursor_ordering)
+
+
+class FollowPagination(LimitOffsetOrCursorPagination):
+    cursor_ordering = ('id',)
+
+
+class FeedPagination(CursorPagination):
+    """Курсор по позиции (pub_date, id) для ленты подписок.
+
+    Лента собирается не одним QuerySet, поэтому страницу отдает сам
+    объект ленты через page(position, size).
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def decode_position(self, request):
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            return None
+        try:
+            pub_date, pk = cursor.position.split('|')
+            position = parse_datetime(pub_date), int(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def paginate_queryset(self, feed, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        page = feed.page(self.decode_position(request), self.page_size + 1)
+        self.next_position = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_position = (
+                f'{page[-1].pub_date.isoformat()}|{page[-1].pk}')
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(
+            Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
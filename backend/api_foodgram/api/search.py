@@ -0,0 +1,130 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.search import SearchVector
+from django.utils.html import escape
+
+SEARCH_CONFIG = 'russian'
+HEADLINE_START = '<b>'
+HEADLINE_STOP = '</b>'
+# ts_headline не экранирует текст, поэтому выделяет слова этими
+# символами, а разметка подставляется после экранирования.
+HEADLINE_START_MARK = '\x02'
+HEADLINE_STOP_MARK = '\x03'
+HEADLINE_WORDS = 35
+# Веса A и B в ts_rank по умолчанию.
+WEIGHTS = {'name': 1.0, 'text': 0.4}
+WORD = re.compile(r'\w+')
+
+
+def recipe_search_vector():
+    """Выражение для колонки search_vector: название важнее описания."""
+    return (SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG))
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+def mark_headline(fragment):
+    """Экранирует фрагмент ts_headline и заменяет метки на разметку."""
+    return escape(fragment).replace(
+        HEADLINE_START_MARK, HEADLINE_START).replace(
+        HEADLINE_STOP_MARK, HEADLINE_STOP)
+
+
+def headline(text, query):
+    """Экранированный фрагмент описания с выделенными словами запроса."""
+    terms = tokenize(query)
+
+    def matches(word):
+        return any(token.startswith(term)
+                   for token in tokenize(word) for term in terms)
+
+    words = text.split()
+    first = next(
+        (index for index, word in enumerate(words) if matches(word)), 0)
+    start = max(0, min(first, len(words) - HEADLINE_WORDS))
+    return ' '.join(
+        f'{HEADLINE_START}{escape(word)}{HEADLINE_STOP}' if matches(word)
+        else escape(word)
+        for word in words[start:start + HEADLINE_WORDS])
+
+
+class InvertedIndex:
+    """Инвертированный индекс рецептов в памяти процесса.
+
+    Заменяет tsvector на базах без полнотекстового поиска, например
+    на SQLite в тестовых запусках. Слово запроса совпадает со всеми
+    словами рецепта, которые с него начинаются.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.words = None
+        self.loaded = False
+
+    def load(self):
+        from .models import Recipe
+        with self.lock:
+            recipes = Recipe.objects.values_list('pk', 'name', 'text')
+            for pk, name, text in recipes.iterator():
+                self.add(pk, name, text)
+            self.loaded = True
+
+    def add(self, pk, name, text):
+        weights = {}
+        for field, value in (('text', text), ('name', name)):
+            for word in tokenize(value):
+                weights[word] = max(weights.get(word, 0), WEIGHTS[field])
+        with self.lock:
+            self.remove(pk)
+            for word, weight in weights.items():
+                self.postings[word][pk] = weight
+            self.documents[pk] = tuple(weights)
+            self.words = None
+
+    def remove(self, pk):
+        with self.lock:
+            for word in self.documents.pop(pk, ()):
+                del self.postings[word][pk]
+                if not self.postings[word]:
+                    del self.postings[word]
+                    self.words = None
+
+    def expand(self, term):
+        if self.words is None:
+            self.words = sorted(self.postings)
+        index = bisect_left(self.words, term)
+        while (index < len(self.words)
+               and self.words[index].startswith(term)):
+            yield self.words[index]
+            index += 1
+
+    def search(self, query):
+        """Возвращает ранги рецептов, в которых есть все слова запроса."""
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            ranks = None
+            for term in set(tokenize(query)):
+                matches = {}
+                for word in self.expand(term):
+                    for pk, weight in self.postings[word].items():
+                        matches[pk] = max(matches.get(pk, 0), weight)
+                if ranks is None:
+                    ranks = matches
+                else:
+                    ranks = {pk: rank + matches[pk]
+                             for pk, rank in ranks.items() if pk in matches}
+                if not ranks:
+                    return {}
+            return ranks or {}
+
+
+search_index = InvertedIndex()
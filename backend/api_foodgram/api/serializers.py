@@ -1,10 +1,13 @@
+from django.conf import settings
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from users.serializers import UserViewSetOutputSerializer
 
-from .models import (Basket, Favorite, Ingredient, IngredientsForRecipe,
-                     Recipe, Tag)
+from .fields import ImageVariantsField
+from .models import Ingredient, IngredientsForRecipe, Recipe, Tag
+from .search import headline, mark_headline
+from .viewer import get_viewer
 
 
 class IngredientViewSetSerializer(serializers.ModelSerializer):
@@ -26,9 +29,7 @@ class IngredientsForRecipeSerializer(serializers.ModelSerializer):
 
 
 class AddIngredientForRecipeSerialzier(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -51,8 +52,7 @@ class TagViewSetSerializer(serializers.ModelSerializer):
 
 
 class RecipesViewSetInputSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(required=True)
     ingredients = AddIngredientForRecipeSerialzier(many=True)
     name = serializers.CharField(required=True, max_length=200)
@@ -68,51 +68,109 @@ class RecipesViewSetInputSerializer(serializers.ModelSerializer):
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError('Ни один ингредиент не выбран')
-        ingredient_list = []
+        ids = {ingredient_item['id'] for ingredient_item in value}
+        if len(ids) != len(value):
+            raise serializers.ValidationError(
+                'Ингредиенты должны быть уникальными')
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = sorted(ids - ingredients.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиентов с id {missing} не существует')
         for ingredient_item in value:
-            if ingredient_item['id'] in ingredient_list:
-                raise serializers.ValidationError(
-                    'Ингредиенты должны быть уникальными')
-            ingredient_list.append(ingredient_item['id'])
+            ingredient_item['id'] = ingredients[ingredient_item['id']]
         return value
 
     def validate_tags(self, value):
-        if len(set(value)) != len(value):
+        ids = set(value)
+        if len(ids) != len(value):
             raise serializers.ValidationError(
                 'Теги должны быть уникальными'
             )
-        return value
+        tags = Tag.objects.in_bulk(ids)
+        missing = sorted(ids - tags.keys())
+        if missing:
+            raise serializers.ValidationError(
+                f'Тегов с id {missing} не существует')
+        return [tags[tag_id] for tag_id in value]
 
 
 class RecipesViewSetOutputSerializer(serializers.ModelSerializer):
-    author = UserViewSetOutputSerializer(read_only=True)
+    author = serializers.SerializerMethodField()
     tags = TagViewSetSerializer(many=True)
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
+    search_headline = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'name', 'text',
-                  'image', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart')
+                  'image', 'image_variants', 'cooking_time', 'is_favorited',
+                  'is_in_shopping_cart', 'favorites_count',
+                  'search_headline')
+
+    def get_author(self, obj):
+        author = obj.author
+        if hasattr(obj, 'is_subscribed'):
+            author.is_subscribed = obj.is_subscribed
+        return UserViewSetOutputSerializer(author, context=self.context).data
 
     def get_ingredients(self, obj):
         ingredients = obj.ingredients_for_recipe.all()
         return IngredientsForRecipeSerializer(ingredients, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return Favorite.objects.filter(
-            user=request.user, recipe=obj).exists()
+        return obj.pk in get_viewer(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return Basket.objects.filter(user=request.user, recipe=obj).exists()
+        return obj.pk in get_viewer(request).basket
+
+    def get_search_headline(self, obj):
+        if hasattr(obj, 'search_headline'):
+            return mark_headline(obj.search_headline)
+        if hasattr(obj, 'search_query'):
+            return headline(obj.text, obj.search_query)
+        return None
+
+
+class RecipeMatchSerializer(RecipesViewSetOutputSerializer):
+    missing_ingredients = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipesViewSetOutputSerializer.Meta):
+        fields = RecipesViewSetOutputSerializer.Meta.fields + (
+            'missing_ingredients',)
+
+
+class HaveIngredientsSerializer(serializers.Serializer):
+    have = serializers.CharField()
+
+    def validate_have(self, value):
+        try:
+            return [int(pk) for pk in value.split(',') if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError(
+                'Укажите id ингредиентов через запятую')
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=settings.BULK_RECIPES_LIMIT)
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
 
 
 class AddFavoriteBasketSerializer(serializers.ModelSerializer):
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Follow
+
+from .cache import RECIPES, REFERENCE_DATA, bump_version
+from .counters import change_counter, counted_pk
+from .matching import log_recipe_change
+from .models import Favorite, Ingredient, Recipe, Tag
+from .search import recipe_search_vector, search_index
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_reference_data(**kwargs):
+    bump_version(REFERENCE_DATA)
+    bump_version(RECIPES)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipes(**kwargs):
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(created, update_fields=None, **kwargs):
+    """Рецепты в кеше содержат профиль автора."""
+    if created or update_fields is not None and not AUTHOR_FIELDS & set(
+            update_fields):
+        return
+    transaction.on_commit(lambda: bump_version(RECIPES))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Follow)
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(sender, [counted_pk(sender, instance)], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Follow)
+def count_deleted(sender, instance, **kwargs):
+    change_counter(sender, [counted_pk(sender, instance)], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector(instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'name', 'text'} & set(
+            update_fields):
+        return
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk=instance.pk).update(
+            search_vector=recipe_search_vector())
+    elif search_index.loaded:
+        transaction.on_commit(lambda: search_index.add(
+            instance.pk, instance.name, instance.text))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(instance, **kwargs):
+    if connection.vendor != 'postgresql' and search_index.loaded:
+        pk = instance.pk
+        transaction.on_commit(lambda: search_index.remove(pk))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def log_ingredients_change(instance, update_fields=None, **kwargs):
+    if update_fields is not None:
+        return
+    pk = instance.pk
+    transaction.on_commit(lambda: log_recipe_change(pk))
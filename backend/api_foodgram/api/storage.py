@@ -0,0 +1,53 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под именем из SHA-256 их содержимого.
+
+    Одинаковые файлы сохраняются один раз, а содержимое файла по
+    данному имени никогда не меняется.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def generate_content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], f'{digest}{extension}')
+
+    def _save(self, name, content):
+        name = self.generate_content_name(name, content)
+        if self.exists(name):
+            # Совпавший файл мог остаться от удаленного рецепта: свежее
+            # время изменения защищает его от collect_media_garbage,
+            # пока новая ссылка на него не сохранена в базе.
+            try:
+                os.utime(self.path(name))
+                return name.replace('\\', '/')
+            except FileNotFoundError:
+                pass
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary_path, self.file_permissions_mode)
+            os.replace(temporary_path, full_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return name.replace('\\', '/')
@@ -0,0 +1,190 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from users.models import Follow
+
+from .models import (Basket, Favorite, Ingredient, IngredientsForRecipe,
+                     Recipe, Tag)
+from .search import headline, mark_headline
+
+User = get_user_model()
+
+PAGE_SIZES = (6, 50, 200)
+# count, страница рецептов вместе с авторами, теги и ингредиенты.
+ANONYMOUS_LIST_QUERIES = 4
+# Плюс подписки, избранное и корзина пользователя для его флагов.
+AUTHENTICATED_LIST_QUERIES = 7
+
+
+class RecipeListQueriesTest(APITestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader', email='r@x.ru')
+        authors = [
+            User.objects.create(username=f'author{number}',
+                                email=f'author{number}@x.ru')
+            for number in range(5)]
+        tags = [
+            Tag.objects.create(name=f'tag{number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)]
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient{number}',
+                                      measurement_unit='г')
+            for number in range(5)]
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=authors[number % len(authors)],
+                   name=f'recipe{number}', text='text', cooking_time=10,
+                   image='recipes/images/test.png')
+            for number in range(max(PAGE_SIZES)))
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe=recipe, tag=tags[number % len(tags)])
+            for number, recipe in enumerate(recipes))
+        IngredientsForRecipe.objects.bulk_create(
+            IngredientsForRecipe(
+                recipe=recipe,
+                ingredient=ingredients[number % len(ingredients)],
+                amount=1)
+            for number, recipe in enumerate(recipes))
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        Basket.objects.create(user=cls.user, recipe=recipes[1])
+
+    def assert_list_queries(self, queries):
+        for size in PAGE_SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': size})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), size)
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(ANONYMOUS_LIST_QUERIES)
+
+    def test_authenticated_list(self):
+        self.client.force_authenticate(self.user)
+        self.assert_list_queries(AUTHENTICATED_LIST_QUERIES)
+
+
+class CountersTest(APITestCase):
+    """Счетчики следуют за строками, созданными и удаленными через ORM."""
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='a@x.ru')
+        self.reader = User.objects.create(username='reader', email='r@x.ru')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text', cooking_time=10,
+            image='recipes/images/test.png')
+
+    def assert_counter(self, obj, counter, value):
+        obj.refresh_from_db(fields=[counter])
+        self.assertEqual(getattr(obj, counter), value)
+
+    def test_orm_rows_are_counted(self):
+        self.assert_counter(self.author, 'recipes_count', 1)
+        favorite = Favorite.objects.create(
+            user=self.reader, recipe=self.recipe)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_counter(self.recipe, 'favorites_count', 1)
+        self.assert_counter(self.author, 'followers_count', 1)
+        favorite.delete()
+        follow.delete()
+        self.assert_counter(self.recipe, 'favorites_count', 0)
+        self.assert_counter(self.author, 'followers_count', 0)
+
+    def test_cascade_delete_is_counted(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        self.assert_counter(self.author, 'followers_count', 0)
+
+    def test_delete_does_not_go_below_zero(self):
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_counter(self.author, 'recipes_count', 0)
+
+
+class RecipeCacheTest(APITestCase):
+    """Кешированный рецепт обновляется после правки профиля автора."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='a@x.ru')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='recipe', text='text', cooking_time=10,
+            image='recipes/images/test.png')
+
+    def get_author_username(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        return response.json()['author']['username']
+
+    def test_author_rename_invalidates_recipe(self):
+        self.assertEqual(self.get_author_username(), 'author')
+        self.author.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.get_author_username(), 'renamed')
+
+    def test_password_change_keeps_recipe_cache(self):
+        self.get_author_username()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.author.set_password('secret')
+            self.author.save(update_fields=['password'])
+        self.assertEqual(callbacks, [])
+
+
+class RecipeCursorTest(APITestCase):
+    """Курсор по популярности проходит одинаковые значения без OFFSET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author', email='a@x.ru')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'recipe{number}', text='text',
+                   cooking_time=10, image='recipes/images/test.png')
+            for number in range(30))
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any(
+                'OFFSET' in query['sql'] for query in queries))
+            page = [recipe['id'] for recipe in response.json()['results']]
+            ids = page + ids if link == 'previous' else ids + page
+            url = response.json()[link]
+            last = response.json()
+        return ids, last
+
+    def test_popular_pages_over_ties(self):
+        expected = list(Recipe.objects.order_by('-id').values_list(
+            'pk', flat=True))
+        ids, last = self.walk(
+            '/api/recipes/?ordering=popular&limit=7&cursor=', 'next')
+        self.assertEqual(ids, expected)
+        ids, _ = self.walk(last['previous'], 'previous')
+        self.assertEqual(ids, expected[:-len(last['results'])])
+
+
+class HeadlineTest(SimpleTestCase):
+
+    def test_text_is_escaped(self):
+        self.assertEqual(
+            headline('суп <img src=x onerror=alert(1)>', 'суп'),
+            '<b>суп</b> &lt;img src=x onerror=alert(1)&gt;')
+
+    def test_marks_become_markup(self):
+        self.assertEqual(
+            mark_headline('\x02суп\x03 <script>'),
+            '<b>суп</b> &lt;script&gt;')
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 
 from rest_framework.routers import DefaultRouter
 
+from .async_views import with_async_views
 from .views import IngredientViewSet, RecipesViewSet, TagViewSet
 
 router = DefaultRouter()
@@ -9,8 +11,12 @@ router.register('tags', TagViewSet, basename='tagviweset')
 router.register('ingredients', IngredientViewSet, basename='ingredientviewset')
 router.register('recipes', RecipesViewSet, basename='recipeviewset')
 
+router_urls = router.urls
+if settings.SERVER_MODE == 'asgi':
+    router_urls = with_async_views(router_urls)
+
 urlpatterns = [
     path('users/', include('users.urls')),
     path('auth/', include('users.urls')),
-    path('', include(router.urls))
+    path('', include(router_urls))
 ]
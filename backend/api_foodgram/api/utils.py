@@ -1,19 +1,37 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Model
+from django.db import transaction
+from django.db.models import Model, Sum
 from django.shortcuts import get_object_or_404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
 
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 from users.serializers import FollowRecipeSerializer
 
-from .models import Basket, Favorite, Recipe
+from .counters import change_counter
+from .links import delete_links, insert_links
+from .models import Basket, Favorite, IngredientsForRecipe, Recipe
+from .viewer import get_viewer
 
 ANSWERS = {
     Favorite: ['избранное', 'избранном'],
     Basket: ['корзину', 'корзине']
 }
 
+SHOPPING_LIST_TITLE = 'Ваш список покупок:'
+SHOPPING_LIST_CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+
 
 def recipe_is_exist(recipe_id):
     try:
@@ -25,24 +43,141 @@ def recipe_is_exist(recipe_id):
             status=HTTP_400_BAD_REQUEST)
 
 
-def add_to(model: Model, user, pk):
-    recipe = recipe_is_exist(pk)
-    obj, obj_status = model.objects.get_or_create(user=user, recipe=recipe)
-    if obj_status:
+def set_prefetched(manager, objects):
+    """Подменяет результат prefetch_related у связи без повторного запроса."""
+    manager.all()._result_cache = sorted(objects, key=lambda obj: obj.pk)
+
+
+def add_to(model: Model, request, pk):
+    with transaction.atomic():
+        added = insert_links(model, request.user, 'recipe', [pk])
+        if added:
+            change_counter(model, added, 1)
+            recipe = Recipe.objects.get(pk=pk)
+    if added:
+        get_viewer(request).invalidate(model)
         serializer = FollowRecipeSerializer(recipe)
         return Response(serializer.data, status=HTTP_201_CREATED)
-
+    recipe_is_exist(pk)
     return Response(
         data={'errors': f'Рецепт уже добавлен в {ANSWERS[model][0]}'},
         status=HTTP_400_BAD_REQUEST)
 
 
-def delete_from(model, user, pk):
-    recipe = recipe_is_exist(pk)
-    obj = model.objects.filter(user=user, recipe=recipe)
-    if obj.exists():
-        obj.delete()
+def delete_from(model, request, pk):
+    with transaction.atomic():
+        deleted = delete_links(model, request.user, 'recipe', [pk])
+        change_counter(model, deleted, -1)
+    if deleted:
+        get_viewer(request).invalidate(model)
         return Response(status=HTTP_204_NO_CONTENT)
+    recipe_is_exist(pk)
     return Response(
         data={'errors': f'Рецепта нет в {ANSWERS[model][1]}'},
         status=HTTP_400_BAD_REQUEST)
+
+
+def bulk_add_to(model, request, ids):
+    """Добавляет рецепты ids одной вставкой и отчитывается по каждому id."""
+    recipes = Recipe.objects.in_bulk(ids)
+    with transaction.atomic():
+        added = set(insert_links(model, request.user, 'recipe', list(recipes)))
+        change_counter(model, added, 1)
+    if added:
+        get_viewer(request).invalidate(model)
+    results = []
+    for pk in ids:
+        if pk not in recipes:
+            results.append({'id': pk, 'status': 'not_found',
+                            'errors': 'Такого рецепта не существует'})
+        elif pk not in added:
+            results.append({
+                'id': pk, 'status': 'exists',
+                'errors': f'Рецепт уже добавлен в {ANSWERS[model][0]}'})
+        else:
+            results.append({
+                'id': pk, 'status': 'added',
+                'recipe': FollowRecipeSerializer(recipes[pk]).data})
+    return Response({'results': results})
+
+
+def bulk_delete_from(model, request, ids):
+    """Удаляет рецепты ids одним DELETE и отчитывается по каждому id."""
+    with transaction.atomic():
+        deleted = set(delete_links(model, request.user, 'recipe', ids))
+        change_counter(model, deleted, -1)
+    if deleted:
+        get_viewer(request).invalidate(model)
+    return Response({'results': [
+        {'id': pk, 'status': 'deleted'} if pk in deleted
+        else {'id': pk, 'status': 'absent',
+              'errors': f'Рецепта нет в {ANSWERS[model][1]}'}
+        for pk in ids]})
+
+
+def get_shopping_list(user):
+    return IngredientsForRecipe.objects.filter(
+        recipe__basket__user=user
+    ).values(
+        'ingredient__id', 'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by('ingredient__name', 'ingredient__measurement_unit')
+
+
+def shopping_list_to_txt(ingredients):
+    yield f'{SHOPPING_LIST_TITLE}\n\n'
+    for ingredient in ingredients.iterator():
+        yield (f'   {ingredient["ingredient__name"]}, '
+               f'{ingredient["ingredient__measurement_unit"]} -- '
+               f'{ingredient["total_amount"]}\n')
+
+
+class Echo:
+    """Отдает записанную строку вместо буферизации для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def shopping_list_to_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SHOPPING_LIST_CSV_HEADER)
+    for ingredient in ingredients.iterator():
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount']))
+
+
+def shopping_list_to_pdf(ingredients):
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_LIST_PDF_FONT))
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    line_height = PDF_FONT_SIZE * 1.5
+    pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+    pdf.drawString(PDF_MARGIN, height - PDF_MARGIN, SHOPPING_LIST_TITLE)
+    y = height - PDF_MARGIN - 2 * line_height
+    for ingredient in ingredients.iterator():
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT_NAME, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(
+            PDF_MARGIN, y,
+            f'{ingredient["ingredient__name"]}, '
+            f'{ingredient["ingredient__measurement_unit"]} -- '
+            f'{ingredient["total_amount"]}')
+        y -= line_height
+    pdf.save()
+    yield buffer.getvalue()
+
+
+SHOPPING_LIST_EXPORTS = {
+    'txt': shopping_list_to_txt,
+    'csv': shopping_list_to_csv,
+    'pdf': shopping_list_to_pdf,
+}
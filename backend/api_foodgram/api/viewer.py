@@ -0,0 +1,61 @@
+from django.utils.functional import cached_property
+
+from users.models import Follow
+
+from .models import Basket, Favorite
+
+
+class Viewer:
+    """Подписки, избранное и корзина текущего пользователя.
+
+    Каждое множество загружается одним запросом при первом обращении
+    и живет до конца запроса.
+    """
+
+    memberships = {
+        Follow: 'following',
+        Favorite: 'favorites',
+        Basket: 'basket',
+    }
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, model, field):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(model.objects.filter(
+            user=self.user).values_list(field, flat=True))
+
+    @cached_property
+    def following(self):
+        return self._ids(Follow, 'author_id')
+
+    @cached_property
+    def favorites(self):
+        return self._ids(Favorite, 'recipe_id')
+
+    @cached_property
+    def basket(self):
+        return self._ids(Basket, 'recipe_id')
+
+    def invalidate(self, model):
+        self.__dict__.pop(self.memberships[model], None)
+
+
+def get_viewer(request):
+    viewer = getattr(request, 'viewer', None)
+    if viewer is None:
+        viewer = Viewer(request.user)
+        request.viewer = viewer
+    return viewer
+
+
+def overlay_recipe_flags(data, viewer):
+    """Проставляет флаги пользователя в общий для всех ответ с рецептами."""
+    recipes = data['results'] if 'results' in data else [data]
+    for recipe in recipes:
+        recipe['is_favorited'] = recipe['id'] in viewer.favorites
+        recipe['is_in_shopping_cart'] = recipe['id'] in viewer.basket
+        recipe['author']['is_subscribed'] = (
+            recipe['author']['id'] in viewer.following)
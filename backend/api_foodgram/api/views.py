@@ -1,46 +1,114 @@
-from functools import reduce
+from functools import lru_cache, partial
 
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import mixins, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.status import HTTP_204_NO_CONTENT
 
+from .cache import (RECIPES, REFERENCE_DATA, ReferenceDataCacheMixin,
+                    build_entry, bump_version, cached_response,
+                    entry_response, get_version)
+from .feed import Feed
 from .filters import IngredientFilter, RecipeFilter
+from .images import schedule_recipe_image
+from .matching import ingredient_index, log_recipe_change
 from .models import (Basket, Favorite, Ingredient, IngredientsForRecipe,
                      Recipe, Tag)
+from .pagination import FeedPagination, RecipePagination
 from .permissions import AnonOrAuthOrAuthor
-from .serializers import (IngredientViewSetSerializer,
-                          RecipesViewSetInputSerializer,
+from .renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                        TextShoppingListRenderer)
+from .serializers import (HaveIngredientsSerializer,
+                          IngredientViewSetSerializer, RecipeIdsSerializer,
+                          RecipeMatchSerializer, RecipesViewSetInputSerializer,
                           RecipesViewSetOutputSerializer, TagViewSetSerializer)
-from .utils import add_to, delete_from
+from .utils import (SHOPPING_LIST_EXPORTS, add_to, bulk_add_to,
+                    bulk_delete_from, delete_from, get_shopping_list,
+                    set_prefetched)
+from .viewer import get_viewer, overlay_recipe_flags
 
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
 
-class TagViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
-                 viewsets.GenericViewSet):
+
+@lru_cache(maxsize=settings.INGREDIENT_PREFIX_CACHE_SIZE)
+def get_short_prefix_entry(name, version, modified):
+    """Держит в памяти процесса ответы на самые частые короткие префиксы."""
+    ingredients = IngredientFilter(
+        {'name': name}, queryset=Ingredient.objects.all()).qs
+    return build_entry(
+        IngredientViewSetSerializer(ingredients, many=True).data, modified)
+
+
+class TagViewSet(ReferenceDataCacheMixin, mixins.ListModelMixin,
+                 mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagViewSetSerializer
     pagination_class = None
 
 
-class IngredientViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin,
-                        viewsets.GenericViewSet):
+class IngredientViewSet(ReferenceDataCacheMixin, mixins.ListModelMixin,
+                        mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientViewSetSerializer
     filter_class = IngredientFilter
     pagination_class = None
-    search_fields = ['^name']
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', '')
+        if 0 < len(name) <= settings.INGREDIENT_PREFIX_CACHE_LENGTH:
+            version = get_version(REFERENCE_DATA)
+            return entry_response(request, get_short_prefix_entry(
+                name, version['id'], version['modified']))
+        return super().list(request, *args, **kwargs)
 
 
 class RecipesViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (AnonOrAuthOrAuthor,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
+    shared_response = False
+
+    def get_queryset(self):
+        user = AnonymousUser() if self.shared_response else self.request.user
+        return Recipe.objects.with_related().with_user_flags(user)
+
+    def get_shared_data(self, handler, *args, **kwargs):
+        """Данные ответа без личных флагов, одинаковые для всех."""
+        self.shared_response = True
+        try:
+            return handler(self.request, *args, **kwargs).data
+        finally:
+            self.shared_response = False
+
+    def cached_response(self, handler, *args, **kwargs):
+        return cached_response(
+            self.request, RECIPES,
+            partial(self.get_shared_data, handler, *args, **kwargs),
+            overlay=partial(
+                overlay_recipe_flags, viewer=get_viewer(self.request)))
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated and any(
+                param in request.query_params for param in USER_FILTERS):
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, *args, **kwargs)
+
+    def get_response_data(self, recipe):
+        recipe = self.get_queryset().get(pk=recipe.pk)
+        return RecipesViewSetOutputSerializer(
+            recipe, context=self.get_serializer_context()).data
 
     def get_serializer_class(self):
         if self.action in ['retrieve', 'list']:
@@ -53,83 +121,176 @@ class RecipesViewSet(viewsets.ModelViewSet):
                 recipe=recipe,
                 ingredient=ingredient['id'],
                 amount=ingredient['amount']) for ingredient in ingredients]
-        IngredientsForRecipe.objects.bulk_create(list_of_ingredients)
+        return IngredientsForRecipe.objects.bulk_create(list_of_ingredients)
+
+    def create_tags_for_recipe(self, tags, recipe):
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            through(recipe=recipe, tag=tag) for tag in tags)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer_class()(data=request.data)
         serializer.is_valid(raise_exception=True)
-        tags = serializer.initial_data['tags']
-        serializer.validated_data.pop('tags')
-        image = serializer.validated_data.pop('image')
+        tags = serializer.validated_data.pop('tags')
         ingredients = serializer.validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(
-            image=image, author=request.user,
-            **serializer.validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients_for_recipe(ingredients, recipe)
-        response = RecipesViewSetOutputSerializer(recipe)
-        return Response(response.data)
-
-    def update(self, request, pk, *args, **kwargs):
-        recipe = self.queryset.get(id=pk)
-        serializer = self.get_serializer_class()(data=request.data)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                author=request.user, **serializer.validated_data)
+            self.create_tags_for_recipe(tags, recipe)
+            self.create_ingredients_for_recipe(ingredients, recipe)
+            schedule_recipe_image(recipe)
+        return Response(self.get_response_data(recipe))
+
+    def update_tags(self, recipe, tags):
+        current = {tag.pk for tag in recipe.tags.all()}
+        new = {tag.pk for tag in tags}
+        through = Recipe.tags.through
+        if current - new:
+            through.objects.filter(
+                recipe=recipe, tag_id__in=current - new).delete()
+        if new - current:
+            self.create_tags_for_recipe(
+                [tag for tag in tags if tag.pk not in current], recipe)
+        set_prefetched(recipe.tags, tags)
+
+    def update_ingredients(self, recipe, ingredients):
+        current = {
+            line.ingredient_id: line
+            for line in recipe.ingredients_for_recipe.all()}
+        new = {item['id'].pk: item for item in ingredients}
+        removed = [
+            line.pk for ingredient_id, line in current.items()
+            if ingredient_id not in new]
+        if removed:
+            IngredientsForRecipe.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, line in current.items():
+            if (ingredient_id in new
+                    and line.amount != new[ingredient_id]['amount']):
+                line.amount = new[ingredient_id]['amount']
+                changed.append(line)
+        if changed:
+            IngredientsForRecipe.objects.bulk_update(changed, ['amount'])
+        created = self.create_ingredients_for_recipe(
+            [item for ingredient_id, item in new.items()
+             if ingredient_id not in current], recipe)
+        set_prefetched(recipe.ingredients_for_recipe, [
+            line for ingredient_id, line in current.items()
+            if ingredient_id in new] + created)
+        transaction.on_commit(lambda: log_recipe_change(recipe.pk))
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        recipe = self.get_object()
+        serializer = self.get_serializer_class()(
+            data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        tags = serializer.initial_data['tags']
-        serializer.validated_data.pop('tags')
-        recipe.image = serializer.validated_data.get('image', recipe.image)
-        recipe.name = serializer.validated_data.get('name', recipe.name)
-        recipe.text = serializer.validated_data.get('text', recipe.text)
-        recipe.cooking_time = serializer.validated_data.get(
-            'cooking_time', recipe.cooking_time)
-        recipe.tags.clear()
-        recipe.tags.set(tags)
-        IngredientsForRecipe.objects.filter(recipe=recipe).all().delete()
-        self.create_ingredients_for_recipe(
-            serializer.validated_data.get('ingredients'), recipe)
-        recipe.save()
-        response = RecipesViewSetOutputSerializer(recipe)
-        return Response(response.data)
+        data = serializer.validated_data
+        with transaction.atomic():
+            fields = [field for field in ('image', 'name', 'text',
+                                          'cooking_time') if field in data]
+            for field in fields:
+                setattr(recipe, field, data[field])
+            if 'image' in data:
+                recipe.image_variants = {}
+                fields.append('image_variants')
+            if fields:
+                recipe.save(update_fields=fields)
+            if 'image' in data:
+                schedule_recipe_image(recipe)
+            if 'tags' in data:
+                self.update_tags(recipe, data['tags'])
+            if 'ingredients' in data:
+                self.update_ingredients(recipe, data['ingredients'])
+            transaction.on_commit(lambda: bump_version(RECIPES))
+        return Response(RecipesViewSetOutputSerializer(
+            recipe, context=self.get_serializer_context()).data)
 
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk):
         if request.method == 'POST':
-            return add_to(Favorite, request.user, pk)
-        return delete_from(Favorite, request.user, pk)
+            return add_to(Favorite, request, pk)
+        return delete_from(Favorite, request, pk)
 
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=[IsAuthenticated])
     def shopping_cart(self, request, pk):
         if request.method == 'POST':
-            return add_to(Basket, request.user, pk)
-        return delete_from(Basket, request.user, pk)
+            return add_to(Basket, request, pk)
+        return delete_from(Basket, request, pk)
+
+    def bulk_change(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            return bulk_add_to(model, request, ids)
+        return bulk_delete_from(model, request, ids)
+
+    @action(detail=False, methods=['POST', 'DELETE'], url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def bulk_favorite(self, request):
+        """Добавляет в избранное или убирает из него список рецептов."""
+        return self.bulk_change(Favorite, request)
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart', permission_classes=[IsAuthenticated])
+    def bulk_shopping_cart(self, request):
+        """Добавляет в корзину или убирает из нее список рецептов."""
+        return self.bulk_change(Basket, request)
+
+    @action(detail=False, methods=['DELETE'], url_path='shopping_cart/clear',
+            permission_classes=[IsAuthenticated])
+    def clear_shopping_cart(self, request):
+        Basket.objects.filter(user=request.user).delete()
+        get_viewer(request).invalidate(Basket)
+        return Response(status=HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['GET'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь."""
+        page = self.paginate_queryset(
+            Feed(request.user, self.get_queryset()))
+        serializer = RecipesViewSetOutputSerializer(
+            page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'],
+            pagination_class=LimitOffsetPagination)
+    def by_ingredients(self, request):
+        """Рецепты из имеющихся продуктов: сначала те, где их
+        меньше всего не хватает.
+        """
+        params = HaveIngredientsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        page = self.paginate_queryset(
+            ingredient_index.match(params.validated_data['have']))
+        recipes = self.get_queryset().in_bulk([pk for pk, missing in page])
+        for pk, missing in page:
+            if pk in recipes:
+                recipes[pk].missing_ingredients = missing
+        serializer = RecipeMatchSerializer(
+            [recipes[pk] for pk, missing in page if pk in recipes],
+            many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['GET'],
-            permission_classes=[IsAuthenticated],)
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[TextShoppingListRenderer,
+                              CSVShoppingListRenderer,
+                              PDFShoppingListRenderer])
     def download_shopping_cart(self, request):
-        text = 'Ваш список покупок:\n\n'
-        user = request.user
-        ingredients = Recipe.objects.filter(
-            basket__user=user
-        ).values('ingredients__name',
-                 'ingredients__measurement_unit').annotate(
-                     amount=Sum('ingredients_for_recipe__amount'))
-
-        ingredients_list = {}
-        for ingredient in ingredients:
-            key = (f'{ingredient["ingredients__name"]}, '
-                   f'{ingredient["ingredients__measurement_unit"]}')
-            if key in ingredients_list:
-                ingredients_list[key] += ingredient['amount']
-            else:
-                ingredients_list[key] = ingredient['amount']
-
-        text += reduce(
-            lambda x, key:
-            x + '   ' + key + ' -- ' + str(ingredients_list[key]) + '\n',
-            ingredients_list, '')
-
-        response = HttpResponse(text, content_type='text/plain; charset=utf-8')
-        filename = 'shopping_list.txt'
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        export = SHOPPING_LIST_EXPORTS[renderer.format]
+        response = StreamingHttpResponse(
+            export(get_shopping_list(request.user)),
+            content_type=content_type)
+        filename = f'shopping_list.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'users',
@@ -50,7 +51,7 @@ REST_FRAMEWORK = {
     ),
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'],
@@ -81,6 +82,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'api_foodgram.wsgi.application'
 
+# wsgi - синхронные воркеры gunicorn, asgi - воркеры uvicorn и асинхронные
+# версии горячих GET-маршрутов. Читается и в gunicorn.conf.py.
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.postgresql'),
@@ -92,6 +97,89 @@ DATABASES = {
     }
 }
 
+# Покрывающий индекс ingr_recipe_covering (INCLUDE amount) нужен только
+# PostgreSQL. На SQLite из тестовых запусков он создается без
+# неключевой колонки, и предупреждение об этом ничего не значит.
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=86400))
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+AUTH_TOKEN_CACHE_TIMEOUT = int(
+    os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=300))
+AUTH_TOKEN_LOCAL_TIMEOUT = 10
+AUTH_TOKEN_LOCAL_SIZE = 10000
+
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 240,
+    'card': 640,
+    'full': 1280,
+}
+
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/variants/'
+
+RECIPE_IMAGE_FORMAT = os.getenv('RECIPE_IMAGE_FORMAT', default='WEBP')
+
+RECIPE_IMAGE_QUALITY = 80
+
+IMAGE_PIPELINE_QUEUE = os.getenv(
+    'IMAGE_PIPELINE_QUEUE', default='api.images.ThreadPoolQueue')
+
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', default=2))
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv('INGREDIENT_AUTOCOMPLETE_LIMIT', default=20))
+
+INGREDIENT_PREFIX_CACHE_LENGTH = 3
+
+INGREDIENT_PREFIX_CACHE_SIZE = 4096
+
+INGREDIENT_INDEX_LOG_TIMEOUT = int(
+    os.getenv('INGREDIENT_INDEX_LOG_TIMEOUT', default=86400))
+INGREDIENT_INDEX_MAX_CHANGES = 10000
+
+TRENDING_HALF_LIFE_HOURS = int(
+    os.getenv('TRENDING_HALF_LIFE_HOURS', default=48))
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', default=14))
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_BASKET_WEIGHT = 0.5
+
+FEED_MERGE_THRESHOLD = int(os.getenv('FEED_MERGE_THRESHOLD', default=1000))
+FEED_AUTHORS_CHUNK = 200
+
+BULK_RECIPES_LIMIT = int(os.getenv('BULK_RECIPES_LIMIT', default=100))
+
+# Новые пароли хешируются Argon2id. Стоимость: ARGON2_TIME_COST - число
+# проходов, ARGON2_MEMORY_COST - память в КиБ, ARGON2_PARALLELISM - число
+# потоков. По умолчанию - минимум, рекомендованный OWASP (19 МиБ, 2 прохода,
+# 1 поток). Проверить влияние на вход: manage.py benchmark_login.
+# Хеши PBKDF2 и хеши со старой стоимостью пересчитываются при входе.
+PASSWORD_HASHERS = [
+    'users.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', default=2))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', default=19456))
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', default=1))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -121,6 +209,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+DEFAULT_FILE_STORAGE = 'api.storage.ContentAddressedStorage'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
@@ -128,3 +218,7 @@ AUTH_USER_MODEL = 'users.User'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 ADMIN_EMAIL = 'admin@iamgroot.tk'
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
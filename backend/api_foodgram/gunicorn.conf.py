@@ -0,0 +1,27 @@
+import os
+
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+CORES = len(os.sched_getaffinity(0))
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'api_foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Цикл событий не простаивает на запросах к базе: процесса на ядро
+    # достаточно.
+    workers = CORES
+else:
+    wsgi_app = 'api_foodgram.wsgi:application'
+    # Синхронный воркер ждет базу вместе с запросом, поэтому их больше,
+    # чем ядер.
+    workers = 2 * CORES + 1
+
+workers = int(os.getenv('GUNICORN_WORKERS', default=workers))
+
+
+def post_worker_init(worker):
+    # Битовые карты для подбора рецептов по продуктам строятся в фоне
+    # сразу после загрузки приложения, а не на первом запросе.
+    from api.matching import ingredient_index
+    ingredient_index.warm_up()
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    return f'auth-token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class TokenCache:
+    """Токены с пользователями: LRU в памяти процесса поверх общего кеша.
+
+    Запись в памяти живет AUTH_TOKEN_LOCAL_TIMEOUT секунд, поэтому
+    сброшенный в общем кеше токен другие процессы забывают не позже
+    этого срока.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = OrderedDict()
+
+    def remember(self, key, token):
+        expires = time.monotonic() + settings.AUTH_TOKEN_LOCAL_TIMEOUT
+        with self.lock:
+            self.tokens[key] = (token, expires)
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > settings.AUTH_TOKEN_LOCAL_SIZE:
+                self.tokens.popitem(last=False)
+
+    def get(self, key):
+        with self.lock:
+            token, expires = self.tokens.get(key, (None, 0))
+            if token is not None and expires > time.monotonic():
+                self.tokens.move_to_end(key)
+                return token
+            self.tokens.pop(key, None)
+        token = cache.get(token_cache_key(key))
+        if token is not None:
+            self.remember(key, token)
+        return token
+
+    def set(self, key, token):
+        cache.set(token_cache_key(key), token,
+                  settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        self.remember(key, token)
+
+    def forget(self, key):
+        cache.delete(token_cache_key(key))
+        with self.lock:
+            self.tokens.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запросов к базе, пока токен в кеше."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
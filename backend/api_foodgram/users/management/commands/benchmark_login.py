@@ -0,0 +1,60 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from users.views import get_token
+
+User = get_user_model()
+
+HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.TunedArgon2PasswordHasher',
+}
+EMAIL = 'benchmark-login@example.com'
+PASSWORD = 'benchmark-password'
+
+
+def percentile(timings, share):
+    return timings[round(share * (len(timings) - 1))]
+
+
+class Command(BaseCommand):
+    help = ('Measures login latency and throughput of the token login view '
+            'for each password hasher. Nothing is written to the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument(
+            '--hashers', nargs='+', choices=HASHERS, default=list(HASHERS))
+
+    def measure(self, requests):
+        factory = APIRequestFactory()
+        timings = []
+        for _ in range(requests):
+            request = factory.post(
+                '/api/auth/token/login/',
+                {'email': EMAIL, 'password': PASSWORD}, format='json')
+            start = time.perf_counter()
+            response = get_token(request)
+            timings.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                raise RuntimeError(f'Login failed: {response.data}')
+        return sorted(timings)
+
+    def handle(self, *args, **options):
+        for name in options['hashers']:
+            with override_settings(PASSWORD_HASHERS=[HASHERS[name]]):
+                with transaction.atomic():
+                    User.objects.create_user(
+                        username='benchmark-login', email=EMAIL,
+                        password=PASSWORD)
+                    timings = self.measure(options['requests'])
+                    transaction.set_rollback(True)
+            self.stdout.write(
+                f'{name}: {len(timings) / sum(timings):.1f} logins/s, '
+                f'p50 {percentile(timings, 0.5) * 1000:.1f} ms, '
+                f'p99 {percentile(timings, 0.99) * 1000:.1f} ms')
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.1 on 2026-10-18 14:29
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Greatest
+import django.db.models.expressions
+
+
+def delete_self_follows(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    self_follows = Follow.objects.using(alias).filter(user=F('author'))
+    authors = list(self_follows.values_list('author_id', flat=True))
+    self_follows.delete()
+    User.objects.using(alias).filter(pk__in=authors).update(
+        followers_count=Greatest(F('followers_count') - 1, 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_self_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(('user', django.db.models.expressions.F('author')), _negated=True), name='no_self_follow'),
+        ),
+    ]
@@ -26,6 +26,10 @@ class User(AbstractUser):
         'Фамилия',
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов', default=0, editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0, editable=False)
 
     class Meta:
         constraints = (
@@ -61,6 +65,9 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='uniq_follow'),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow'),
         )
         ordering = ['id']
         verbose_name = 'Подписка'
@@ -1,12 +1,11 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
-from django.shortcuts import get_object_or_404
 
+from api.fields import ImageVariantsField
 from api.models import Recipe
+from api.viewer import get_viewer
 from rest_framework import serializers
 
-from .models import Follow
-
 User = get_user_model()
 
 BAD_USERNAME = [
@@ -57,19 +56,23 @@ class UserViewSetOutputSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed')
+                  'is_subscribed', 'recipes_count', 'followers_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if not request or not request.user.is_authenticated:
+        if not request:
             return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        return obj.pk in get_viewer(request).following
 
 
 class FollowRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowUserSerializer(serializers.ModelSerializer):
@@ -80,15 +83,20 @@ class FollowUserSerializer(serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(
-        source='author.recipes.count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
+    followers_count = serializers.ReadOnlyField(
+        source='author.followers_count')
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
 
     def get_recipes(self, obj):
+        if hasattr(obj.author, 'subscription_recipes'):
+            return FollowRecipeSerializer(
+                obj.author.subscription_recipes, many=True).data
         request = self.context.get('request')
         recipes = obj.author.recipes.all()
         if request:
@@ -101,9 +109,9 @@ class FollowUserSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(
-            user=request.user, author=obj.author
-        ).exists()
+        if obj.user_id == request.user.id:
+            return True
+        return obj.author_id in get_viewer(request).following
 
 
 class UserSetPasswordSerializer(serializers.Serializer):
@@ -115,16 +123,13 @@ class GetTokenSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True, max_length=254)
     password = serializers.CharField(required=True, max_length=150)
 
-    def validate_email(self, value):
-        if not User.objects.filter(email=value).exists():
-            raise serializers.ValidationError(
-                'Пользователь с таким email не найден')
-        return value
-
     def validate(self, data):
-        email = data.get('email')
-        user = get_object_or_404(User, email=email)
-        if not user.check_password(data.get('password')):
+        user = User.objects.filter(email=data['email']).first()
+        if user is None:
+            raise serializers.ValidationError(
+                detail={'email': ['Пользователь с таким email не найден']})
+        if not user.check_password(data['password']):
             raise serializers.ValidationError(
                 detail={'error': 'Комбинация email и password не совпадает'})
+        data['user'] = user
         return data
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(instance, **kwargs):
+    token_cache.forget(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(instance, created, **kwargs):
+    """Сбрасывает токен после смены пароля, блокировки и других правок."""
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True):
+        token_cache.forget(key)
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+
+from .models import Follow
+
+User = get_user_model()
+
+
+class SubscribeTest(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader', email='r@x.ru')
+        self.client.force_authenticate(self.user)
+
+    def test_self_subscribe_with_padded_id(self):
+        for pk in (self.user.pk, f'0{self.user.pk}'):
+            with self.subTest(pk=pk):
+                response = self.client.post(f'/api/users/{pk}/subscribe/')
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
+        self.user.refresh_from_db(fields=['followers_count'])
+        self.assertEqual(self.user.followers_count, 0)
+
+    def test_not_numeric_id(self):
+        response = self.client.post('/api/users/me/subscribe/')
+        self.assertEqual(response.status_code, 404)
@@ -1,17 +1,25 @@
 from django.contrib.auth import get_user_model
-from django.contrib.auth.hashers import check_password, make_password
-from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import mixins, viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action, api_view
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
                                    HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST,
                                    HTTP_401_UNAUTHORIZED)
 
+from api.counters import change_counter
+from api.links import delete_links, insert_links
+from api.models import Recipe
+from api.pagination import FollowPagination
+from api.viewer import get_viewer
+
 from .models import Follow
 from .serializers import (FollowUserSerializer, GetTokenSerializer,
                           UserSetPasswordSerializer,
@@ -20,14 +28,20 @@ from .serializers import (FollowUserSerializer, GetTokenSerializer,
 
 User = get_user_model()
 
+LATEST_RECIPES_SQL = (
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS number '
+    'FROM api_recipe WHERE author_id IN ({authors})'
+    ') AS latest WHERE number <= %s')
+
 
 @api_view(['POST'])
 def get_token(request):
     serializer = GetTokenSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    email = serializer.validated_data.get('email')
-    user = get_object_or_404(User, email=email)
-    token = Token.objects.create(user=user)
+    token, _ = Token.objects.get_or_create(
+        user=serializer.validated_data['user'])
     return Response(
         {'auth_token': f'{token.key}'}, status=HTTP_201_CREATED
     )
@@ -47,7 +61,7 @@ def delete_token(request):
 class UserViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
                   mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     queryset = User.objects.all()
-    pagination_class = LimitOffsetPagination
+    pagination_class = FollowPagination
 
     action_serializer_classes = {
         'create': UserViewSetInputSerializer,
@@ -68,6 +82,36 @@ class UserViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
     def get_serializer_class(self):
         return self.action_serializer_classes.get(self.action, None)
 
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            return int(recipes_limit)
+        return None
+
+    def get_subscriptions(self):
+        return Follow.objects.filter(
+            user=self.request.user).select_related('author')
+
+    def prefetch_recipes(self, follows):
+        """Загружает последние рецепты авторов страницы одним запросом.
+
+        Ограничение recipes_limit на автора считается через ROW_NUMBER()
+        по рецептам только этих авторов: Django 4.0 не умеет фильтровать
+        по оконной функции, поэтому подзапрос написан на SQL.
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        authors = list({follow.author_id for follow in follows})
+        if recipes_limit is not None and authors:
+            recipes = recipes.filter(pk__in=RawSQL(
+                LATEST_RECIPES_SQL.format(
+                    authors=', '.join(['%s'] * len(authors))),
+                authors + [recipes_limit]))
+        prefetch_related_objects(follows, Prefetch(
+            'author__recipes', queryset=recipes,
+            to_attr='subscription_recipes'))
+        return follows
+
     def create(self, request, *args, **kwargs):
         serializer_class = self.get_serializer_class()
         serializer_data = serializer_class(data=request.data)
@@ -86,25 +130,25 @@ class UserViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
         serializer.is_valid(raise_exception=True)
         new_password = serializer.validated_data.get('new_password')
         current_password = serializer.validated_data.get('current_password')
-        user = get_object_or_404(User, id=request.user.id)
-        if not check_password(current_password, user.password):
+        if not request.user.check_password(current_password):
             return Response({'current_password': 'Текущий пароль неверен'},
                             status=HTTP_400_BAD_REQUEST)
-        user.set_password(new_password)
-        user.save()
+        request.user.set_password(new_password)
+        request.user.save(update_fields=['password'])
         return Response(status=HTTP_204_NO_CONTENT)
 
     @action(methods=['GET'], detail=False,
             permission_classes=[IsAuthenticated])
     def me(self, request):
-        serializer = UserViewSetOutputSerializer(request.user)
+        serializer = UserViewSetOutputSerializer(
+            User.objects.get(pk=request.user.pk))
         return Response(serializer.data, status=HTTP_200_OK)
 
     @action(methods=['GET'], detail=False,
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        follows = Follow.objects.filter(user=request.user)
-        pages = self.paginate_queryset(follows)
+        pages = self.prefetch_recipes(
+            self.paginate_queryset(self.get_subscriptions()))
         serializer = FollowUserSerializer(
             pages, many=True, context={'request': request})
         return self.get_paginated_response(serializer.data)
@@ -117,30 +161,40 @@ class UserViewSet(mixins.ListModelMixin, mixins.CreateModelMixin,
             'DELETE': ['Отписаться', 'от']
         }
 
-        if pk == request.user.pk:
+        try:
+            author_id = int(pk)
+        except ValueError:
+            raise Http404
+        if author_id == request.user.pk:
             return Response(
                 data={'errors': f'Вы не можете {answers[request.method][0]} '
                                 f'{answers[request.method][1]} самого себя'},
                 status=HTTP_400_BAD_REQUEST)
 
-        author = get_object_or_404(User, id=pk)
-
         if request.method == 'DELETE':
-            try:
-                follow = Follow.objects.get(user=request.user, author=author)
-                follow.delete()
+            with transaction.atomic():
+                deleted = delete_links(
+                    Follow, request.user, 'author', [author_id])
+                change_counter(Follow, deleted, -1)
+            if deleted:
+                get_viewer(request).invalidate(Follow)
                 return Response(status=HTTP_204_NO_CONTENT)
-            except ObjectDoesNotExist:
-                return Response(
-                    data={'errors': 'Вы не подписаны на данного автора'},
-                    status=HTTP_400_BAD_REQUEST)
-
-        if request.method == 'POST':
-            if Follow.objects.filter(
-                    user=request.user, author=author).exists():
-                return Response(
-                    data={'errors': 'Вы уже подписаны на данного автора'},
-                    status=HTTP_400_BAD_REQUEST)
-            follow = Follow.objects.create(user=request.user, author=author)
-            response = FollowUserSerializer(follow)
-            return Response(response.data, status=HTTP_201_CREATED)
+            get_object_or_404(User, id=author_id)
+            return Response(
+                data={'errors': 'Вы не подписаны на данного автора'},
+                status=HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            added = insert_links(Follow, request.user, 'author', [author_id])
+            if added:
+                change_counter(Follow, added, 1)
+                follow = self.get_subscriptions().get(author_id=author_id)
+                self.prefetch_recipes([follow])
+        if not added:
+            get_object_or_404(User, id=author_id)
+            return Response(
+                data={'errors': 'Вы уже подписаны на данного автора'},
+                status=HTTP_400_BAD_REQUEST)
+        get_viewer(request).invalidate(Follow)
+        response = FollowUserSerializer(follow, context={'request': request})
+        return Response(response.data, status=HTTP_201_CREATED)